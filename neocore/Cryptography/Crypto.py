@@ -1,19 +1,67 @@
+import asyncio
+import os
+import threading
+import weakref
 import bitcoin
+from concurrent.futures import ThreadPoolExecutor
 from ecdsa import NIST256p, VerifyingKey
 from logzero import logger
 from .Helper import *
 from neocore.UInt160 import UInt160
-from .ECCurve import EllipticCurve
+from .ECCurve import EllipticCurve, ECDSA
+from .LRUCache import LRUCache
+
+# signature verification backends, see Crypto.SetVerificationBackend
+VERIFICATION_BACKEND_NATIVE = 'native'
+VERIFICATION_BACKEND_ECDSA = 'ecdsa'
+
+# maximum number of calls the async API runs on its executor at the same time, see Crypto.SetAsyncExecutor
+ASYNC_MAX_CONCURRENCY = os.cpu_count() or 1
+
+# buffers of at least this many bytes are hashed on the thread pool by `Crypto.Hash256Many` and
+# `Crypto.Hash160Many`, hashlib releases the GIL for inputs larger than 2047 bytes
+HASH_PARALLEL_THRESHOLD = 2048
+
+# number of threads of the hashing thread pool
+HASH_THREAD_POOL_SIZE = os.cpu_count() or 1
+
+# number of python-ecdsa verifying keys kept by the ecdsa verification backend
+VERIFYING_KEY_CACHE_SIZE = 256
+
+# number of successful verifications remembered by `Crypto.VerifySignature` once the
+# verification cache is enabled with `Crypto.SetVerificationCacheSize`
+VERIFICATION_CACHE_SIZE = 16384
 
 
 class Crypto(object):
 
     _Instance = None
 
+    _VerificationBackend = VERIFICATION_BACKEND_NATIVE
+
+    _VerifyingKeyCache = LRUCache(VERIFYING_KEY_CACHE_SIZE)
+
+    # disabled by default
+    _VerificationCache = LRUCache(0)
+
+    _AsyncExecutor = None
+
+    _AsyncMaxConcurrency = ASYNC_MAX_CONCURRENCY
+
+    # a semaphore per event loop, asyncio primitives can not be shared between loops
+    _AsyncSemaphores = weakref.WeakKeyDictionary()
+
+    _HashPool = None
+
+    _HashPoolLock = threading.Lock()
+
     @staticmethod
     def SetupSignatureCurve():
         """
-        Setup the Elliptic curve parameters.
+        Setup the Elliptic curve parameters of pybitcointools.
+
+        Signing and verifying no longer use pybitcointools, this is only needed by callers
+        using its global curve directly.
         """
         bitcoin.change_curve(
             int("FFFFFFFF00000001000000000000000000000000FFFFFFFFFFFFFFFFFFFFFFFF", 16),
@@ -24,6 +72,159 @@ class Crypto(object):
             int("4FE342E2FE1A7F9B8EE7EB4A7C0F9E162BCE33576B315ECECBB6406837BF51F5", 16)
         )
 
+    @staticmethod
+    def SetVerificationBackend(backend):
+        """
+        Select the implementation used by `VerifySignature`.
+
+        Args:
+            backend (str): VERIFICATION_BACKEND_NATIVE (default) to verify with the curve
+                arithmetic of this package, or VERIFICATION_BACKEND_ECDSA to use python-ecdsa.
+        """
+        if backend not in (VERIFICATION_BACKEND_NATIVE, VERIFICATION_BACKEND_ECDSA):
+            raise ValueError("Unknown verification backend: %s" % backend)
+        Crypto._VerificationBackend = backend
+
+    @staticmethod
+    def ClearVerifyingKeyCache():
+        """
+        Remove all python-ecdsa verifying keys cached by the ecdsa verification backend.
+        """
+        Crypto._VerifyingKeyCache.clear()
+
+    @staticmethod
+    def VerifyingKeyCacheStats():
+        """
+        Get the statistics of the python-ecdsa verifying key cache.
+
+        Returns:
+            dict: with the keys `hits`, `misses`, `size` and `max_size`.
+        """
+        return Crypto._VerifyingKeyCache.stats()
+
+    @staticmethod
+    def SetVerifyingKeyCacheSize(max_size):
+        """
+        Change the number of python-ecdsa verifying keys kept by the ecdsa verification backend.
+
+        Args:
+            max_size (int): maximum number of keys. 0 disables the cache.
+        """
+        Crypto._VerifyingKeyCache.resize(max_size)
+
+    @staticmethod
+    def SetVerificationCacheSize(max_size=VERIFICATION_CACHE_SIZE):
+        """
+        Enable the verification cache, which remembers successful signature verifications
+        so a signature seen again is accepted without checking it. Failed verifications
+        are never cached.
+
+        Args:
+            max_size (int): maximum number of remembered verifications. 0 disables the cache.
+        """
+        Crypto._VerificationCache.resize(max_size)
+
+    @staticmethod
+    def ClearVerificationCache():
+        """
+        Forget all remembered verifications.
+        """
+        Crypto._VerificationCache.clear()
+
+    @staticmethod
+    def VerificationCacheStats():
+        """
+        Get the statistics of the verification cache.
+
+        Returns:
+            dict: with the keys `hits`, `misses`, `size` and `max_size`.
+        """
+        return Crypto._VerificationCache.stats()
+
+    @staticmethod
+    def SetAsyncExecutor(executor=None, max_concurrency=ASYNC_MAX_CONCURRENCY):
+        """
+        Configure where the async API runs its work.
+
+        Args:
+            executor (concurrent.futures.Executor): the executor, None to use the default executor of the event loop.
+                A ProcessPoolExecutor spreads the work over several cores.
+            max_concurrency (int): maximum number of calls running on the executor at the same time, further calls
+                wait for a free slot without blocking the event loop.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        Crypto._AsyncExecutor = executor
+        Crypto._AsyncMaxConcurrency = max_concurrency
+        Crypto._AsyncSemaphores = weakref.WeakKeyDictionary()
+
+    @staticmethod
+    async def run_async(func, *args):
+        """
+        Run a blocking call on the executor of the async API, waiting for a free slot first.
+
+        Args:
+            func (callable): the function to call, it has to be picklable when a process pool is used.
+            *args: the arguments of `func`.
+
+        Returns:
+            the result of `func`.
+        """
+        loop = asyncio.get_event_loop()
+        semaphore = Crypto._AsyncSemaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(Crypto._AsyncMaxConcurrency)
+            Crypto._AsyncSemaphores[loop] = semaphore
+
+        async with semaphore:
+            return await loop.run_in_executor(Crypto._AsyncExecutor, func, *args)
+
+    @staticmethod
+    async def verify_async(message, signature, public_key, unhex=True):
+        """
+        Verify the integrity of the message without blocking the event loop, see `VerifySignature`.
+
+        Args:
+            message (str): the message to verify.
+            signature (bytearray): the signature belonging to the message.
+            public_key (ECPoint|bytes): the public key to use for verifying the signature.
+            unhex (bool): whether the message should be unhexlified before verifying
+
+        Returns:
+            bool: True if verification passes. False otherwise.
+        """
+        if isinstance(public_key, EllipticCurve.ECPoint):
+            # send the raw coordinates, the point drags its curve along when pickled
+            public_key = public_key.x.value.to_bytes(32, 'big') + public_key.y.value.to_bytes(32, 'big')
+        return await Crypto.run_async(Crypto.VerifySignature, message, signature, public_key, unhex)
+
+    @staticmethod
+    async def hash256_async(message):
+        """
+        Get the double sha256 hash of the message without blocking the event loop, see `Hash256`.
+
+        Args:
+            message (bytes): message to hash.
+
+        Returns:
+            bytes: hash.
+        """
+        return await Crypto.run_async(Crypto.Hash256, message)
+
+    @staticmethod
+    async def hash160_async(message):
+        """
+        Get the ripemd160 hash of the sha256 hash of the message without blocking the event loop,
+        see `Hash160Bytes`.
+
+        Args:
+            message (bytes): message to hash.
+
+        Returns:
+            bytes: hash.
+        """
+        return await Crypto.run_async(Crypto.Hash160Bytes, message)
+
     @staticmethod
     def Default():
         """
@@ -73,6 +274,84 @@ class Crypto(object):
         """
         return bin_dbl_sha256(message)
 
+    @staticmethod
+    def Hash256Many(buffers):
+        """
+        Get the double SHA256 hashes of many messages, see `Hash256`.
+
+        Messages of at least HASH_PARALLEL_THRESHOLD bytes are hashed on a thread pool, hashlib does
+        not hold the GIL while hashing them so they use all cores. Smaller messages are hashed inline.
+
+        Args:
+            buffers (iterable): the messages to hash.
+
+        Returns:
+            list: the hash of every message, in the order of `buffers`.
+        """
+        return Crypto._HashMany(bin_dbl_sha256, buffers)
+
+    @staticmethod
+    def Hash160Many(buffers):
+        """
+        Get the ripemd160 hashes of the SHA256 hashes of many messages, see `Hash160Bytes` and `Hash256Many`.
+
+        Args:
+            buffers (iterable): the messages to hash.
+
+        Returns:
+            list: the hash of every message, in the order of `buffers`.
+        """
+        return Crypto._HashMany(bin_hash160Bytes, buffers)
+
+    @staticmethod
+    def _HashMany(hash_function, buffers):
+        """
+        Hash the large buffers on the thread pool, while the small ones are hashed inline.
+
+        Args:
+            hash_function (callable): hashes a single buffer.
+            buffers (iterable): the messages to hash.
+
+        Returns:
+            list: the hash of every buffer, in the order of `buffers`.
+        """
+        buffers = list(buffers)
+        large = [index for index, buffer in enumerate(buffers) if len(buffer) >= HASH_PARALLEL_THRESHOLD]
+        if len(large) < 2 or HASH_THREAD_POOL_SIZE < 2:
+            return [hash_function(buffer) for buffer in buffers]
+
+        def hash_chunk(indexes):
+            return [hash_function(buffers[index]) for index in indexes]
+
+        # one task per thread keeps the scheduling overhead independent of the number of buffers
+        size = -(-len(large) // HASH_THREAD_POOL_SIZE)
+        chunks = [large[i:i + size] for i in range(0, len(large), size)]
+        futures = [Crypto._GetHashPool().submit(hash_chunk, chunk) for chunk in chunks]
+
+        results = [None] * len(buffers)
+        large_indexes = set(large)
+        for index, buffer in enumerate(buffers):
+            if index not in large_indexes:
+                results[index] = hash_function(buffer)
+
+        for chunk, future in zip(chunks, futures):
+            for index, result in zip(chunk, future.result()):
+                results[index] = result
+        return results
+
+    @staticmethod
+    def _GetHashPool():
+        """
+        Get the thread pool of `Hash256Many` and `Hash160Many`, created on first use.
+
+        Returns:
+            ThreadPoolExecutor:
+        """
+        with Crypto._HashPoolLock:
+            if Crypto._HashPool is None:
+                Crypto._HashPool = ThreadPoolExecutor(max_workers=HASH_THREAD_POOL_SIZE)
+            return Crypto._HashPool
+
     @staticmethod
     def ToScriptHash(data, unhex=True):
         """
@@ -87,7 +366,7 @@ class Crypto(object):
         """
         if len(data) > 1 and unhex:
             data = binascii.unhexlify(data)
-        return UInt160(data=binascii.unhexlify(bytes(Crypto.Hash160(data), encoding='utf-8')))
+        return UInt160(data=bin_hash160Bytes(data))
 
     @staticmethod
     def ToAddress(script_hash):
@@ -114,9 +393,26 @@ class Crypto(object):
             bytearray: the signature of the message.
         """
 
-        hash = hashlib.sha256(binascii.unhexlify(message)).hexdigest()
+        hash = hashlib.sha256(binascii.unhexlify(message)).digest()
 
-        v, r, s = bitcoin.ecdsa_raw_sign(hash, private_key)
+        return Crypto.sign_digest(hash, private_key)
+
+    @staticmethod
+    def sign_digest(digest, private_key):
+        """
+        Sign a precomputed SHA-256 digest of a message.
+
+        Args:
+            digest (bytes): the 32 byte SHA-256 digest of the raw message.
+            private_key (bytes|str|int): 32 raw bytes, 64 hex digits or an integer.
+
+        Returns:
+            bytearray: the signature of the message, equal to `Sign` of the message.
+        """
+        if len(digest) != 32:
+            raise ValueError("digest must be 32 bytes")
+
+        r, s = ECDSA.secp256r1().sign_deterministic(bytes(digest), Crypto._PrivateKeyInt(private_key))
 
         rb = bytearray(r.to_bytes(32, 'big'))
         sb = bytearray(s.to_bytes(32, 'big'))
@@ -125,6 +421,25 @@ class Crypto(object):
 
         return sig
 
+    @staticmethod
+    def _PrivateKeyInt(private_key):
+        """
+        Get the integer value of a private key.
+
+        Args:
+            private_key (bytes|str|int): 32 raw bytes, 64 hex digits or an integer.
+
+        Returns:
+            int: the private key.
+        """
+        if isinstance(private_key, int):
+            return private_key
+        if len(private_key) == 64:
+            private_key = binascii.unhexlify(private_key)
+        if len(private_key) != 32:
+            raise ValueError("Invalid private key")
+        return int.from_bytes(private_key, 'big')
+
     @staticmethod
     def VerifySignature(message, signature, public_key, unhex=True):
         """
@@ -140,12 +455,163 @@ class Crypto(object):
             bool: True if verification passes. False otherwise.
         """
 
-        if type(public_key) is EllipticCurve.ECPoint:
-            pubkey_x = public_key.x.value.to_bytes(32, 'big')
-            pubkey_y = public_key.y.value.to_bytes(32, 'big')
+        digest = Crypto._MessageDigest(message, unhex)
+        if digest is None:
+            return False
 
-            public_key = pubkey_x + pubkey_y
+        return Crypto.verify_digest(digest, signature, public_key)
+
+    @staticmethod
+    def verify_digest(digest, signature, public_key):
+        """
+        Verify a signature against a precomputed SHA-256 digest of the message.
+
+        Args:
+            digest (bytes): the 32 byte SHA-256 digest of the raw message.
+            signature (bytearray): the signature belonging to the message.
+            public_key (ECPoint|bytes): the public key to use for verifying the signature, see `VerifySignature`.
+
+        Returns:
+            bool: True if verification passes. False otherwise.
+        """
+        if len(digest) != 32:
+            raise ValueError("digest must be 32 bytes")
+        digest = bytes(digest)
+
+        cache_key = Crypto._VerificationCacheKey(digest, signature, public_key)
+        if cache_key is not None and Crypto._VerificationCache.get(cache_key):
+            return True
+
+        if Crypto._VerificationBackend == VERIFICATION_BACKEND_ECDSA:
+            result = Crypto._VerifySignatureEcdsa(digest, signature, public_key)
+        else:
+            result = Crypto._VerifySignatureNative(digest, signature, public_key)
+
+        if result and cache_key is not None:
+            Crypto._VerificationCache.put(cache_key, True)
+        return result
+
+    @staticmethod
+    def VerifySignatures(items, unhex=True):
+        """
+        Verify many signatures at once.
+
+        With the native backend the signatures are checked in randomized batches, which is
+        cheaper than checking them one by one. A batch that fails is split until the invalid
+        signatures are found, so the result of every item is the same as with `VerifySignature`.
+
+        Args:
+            items (iterable): (message, signature, public_key) tuples, see `VerifySignature`.
+            unhex (bool): whether the messages should be unhexlified before verifying
+
+        Returns:
+            list: a bool per item, in the order of `items`.
+        """
+        items = list(items)
+        results = [False] * len(items)
+        indexes = []
+        digests = []
+        for index, (message, signature, public_key) in enumerate(items):
+            digest = Crypto._MessageDigest(message, unhex)
+            if digest is not None:
+                indexes.append(index)
+                digests.append((digest, signature, public_key))
+
+        for index, result in zip(indexes, Crypto.verify_digests(digests)):
+            results[index] = result
+        return results
+
+    @staticmethod
+    def verify_digests(items):
+        """
+        Verify many signatures against precomputed SHA-256 digests at once, see `VerifySignatures`.
+
+        Args:
+            items (iterable): (digest, signature, public_key) tuples, see `verify_digest`.
+
+        Returns:
+            list: a bool per item, in the order of `items`.
+        """
+        items = list(items)
+        if Crypto._VerificationBackend == VERIFICATION_BACKEND_ECDSA:
+            return [Crypto.verify_digest(digest, signature, public_key) for digest, signature, public_key in items]
+
+        curve = ECDSA.secp256r1()
+        cache = Crypto._VerificationCache
+        results = [False] * len(items)
+        indexes = []
+        cache_keys = []
+        batch = []
+        for index, (digest, signature, public_key) in enumerate(items):
+            if len(digest) != 32:
+                raise ValueError("digest must be 32 bytes")
+            digest = bytes(digest)
+            if len(signature) != 64:
+                continue
+            cache_key = Crypto._VerificationCacheKey(digest, signature, public_key)
+            if cache_key is not None and cache.get(cache_key):
+                results[index] = True
+                continue
+            try:
+                point = curve.decode_public_key(public_key)
+            except Exception as e:
+                continue
+            m = int.from_bytes(digest, 'big')
+            r = int.from_bytes(signature[:32], 'big')
+            s = int.from_bytes(signature[32:], 'big')
+            indexes.append(index)
+            cache_keys.append(cache_key)
+            batch.append((m, point, r, s))
+
+        for index, cache_key, result in zip(indexes, cache_keys, curve.verify_batch(batch)):
+            results[index] = result
+            if result and cache_key is not None:
+                cache.put(cache_key, True)
+        return results
+
+    @staticmethod
+    def _VerificationCacheKey(digest, signature, public_key):
+        """
+        Get the key of a verification in the verification cache.
+
+        Args:
+            digest (bytes): the SHA-256 digest of the message.
+            signature (bytes): the signature.
+            public_key (ECPoint|bytes): the public key.
+
+        Returns:
+            bytes: a digest of the message hash, the signature and the public key, or None if
+            the cache is disabled or the arguments can not be digested.
+        """
+        if not Crypto._VerificationCache.max_size:
+            return None
+
+        try:
+            if isinstance(public_key, EllipticCurve.ECPoint):
+                public_key = public_key.x.value.to_bytes(32, 'big') + public_key.y.value.to_bytes(32, 'big')
+            signature = bytes(signature)
+            # the signature length is part of the key, so bytes can not move between the
+            # signature and the public key
+            key = hashlib.sha256(digest)
+            key.update(len(signature).to_bytes(4, 'big'))
+            key.update(signature)
+            key.update(bytes(public_key))
+            return key.digest()
+        except Exception as e:
+            return None
 
+    @staticmethod
+    def _MessageBytes(message, unhex):
+        """
+        Get the raw bytes of a message passed to `VerifySignature`.
+
+        Args:
+            message (str|bytes): the message.
+            unhex (bool): whether the message should be unhexlified.
+
+        Returns:
+            bytes: the raw message.
+        """
         if unhex:
             try:
                 message = binascii.unhexlify(message)
@@ -153,25 +619,105 @@ class Crypto(object):
                 logger.error("could not get m: %s" % e)
         elif isinstance(message, str):
             message = message.encode('utf-8')
+        return message
+
+    @staticmethod
+    def _MessageDigest(message, unhex):
+        """
+        Get the SHA-256 digest of a message passed to `VerifySignature`.
 
-        if len(public_key) == 33:
-            public_key = bitcoin.decompress(public_key)
-            public_key = public_key[1:]
+        Args:
+            message (str|bytes): the message.
+            unhex (bool): whether the message should be unhexlified.
 
+        Returns:
+            bytes: the digest, or None if the message is not usable.
+        """
         try:
-            vk = VerifyingKey.from_string(public_key, curve=NIST256p, hashfunc=hashlib.sha256)
-            res = vk.verify(signature, message, hashfunc=hashlib.sha256)
+            return hashlib.sha256(Crypto._MessageBytes(message, unhex)).digest()
+        except Exception as e:
+            return None
+
+    @staticmethod
+    def _VerifySignatureNative(digest, signature, public_key):
+        """
+        Verify a signature with the secp256r1 arithmetic of ECCurve.
+
+        Args:
+            digest (bytes): the SHA-256 digest of the message.
+            signature (bytes): 64 byte r and s values.
+            public_key (ECPoint|bytes): the public key.
+
+        Returns:
+            bool: True if verification passes. False otherwise.
+        """
+        if len(signature) != 64:
+            return False
+
+        try:
+            curve = ECDSA.secp256r1()
+            point = curve.decode_public_key(public_key)
+            m = int.from_bytes(digest, 'big')
+            r = int.from_bytes(signature[:32], 'big')
+            s = int.from_bytes(signature[32:], 'big')
+            return curve.verify(m, point, r, s)
+        except Exception as e:
+            pass
+
+        return False
+
+    @staticmethod
+    def _VerifySignatureEcdsa(digest, signature, public_key):
+        """
+        Verify a signature with python-ecdsa.
+
+        Args:
+            digest (bytes): the SHA-256 digest of the message.
+            signature (bytes): 64 byte r and s values.
+            public_key (ECPoint|bytes): the public key.
+
+        Returns:
+            bool: True if verification passes. False otherwise.
+        """
+        if type(public_key) is EllipticCurve.ECPoint:
+            pubkey_x = public_key.x.value.to_bytes(32, 'big')
+            pubkey_y = public_key.y.value.to_bytes(32, 'big')
+
+            public_key = pubkey_x + pubkey_y
+
+        try:
+            if len(public_key) == 33:
+                point = ECDSA.secp256r1().decode_public_key(public_key)
+                public_key = point.x.value.to_bytes(32, 'big') + point.y.value.to_bytes(32, 'big')
+
+            vk = Crypto._VerifyingKey(bytes(public_key))
+            res = vk.verify_digest(signature, digest)
             return res
         except Exception as e:
             pass
 
         return False
 
+    @staticmethod
+    def _VerifyingKey(public_key):
+        """
+        Get the python-ecdsa verifying key of a public key, parsing and validating
+        the key only the first time it is seen.
+
+        Args:
+            public_key (bytes): 64 byte x and y coordinates.
+
+        Returns:
+            VerifyingKey:
+        """
+        vk = Crypto._VerifyingKeyCache.get(public_key)
+        if vk is None:
+            vk = VerifyingKey.from_string(public_key, curve=NIST256p, hashfunc=hashlib.sha256)
+            Crypto._VerifyingKeyCache.put(public_key, vk)
+        return vk
 
-class CryptoInstance():
 
-    def __init__(self):
-        Crypto.SetupSignatureCurve()
+class CryptoInstance():
 
     def Hash160(self, message):
         """
@@ -223,3 +769,16 @@ class CryptoInstance():
             bool: True if verification passes. False otherwise.
         """
         return Crypto.VerifySignature(message, signature, public_key, unhex=unhex)
+
+    def VerifySignatures(self, items, unhex=True):
+        """
+        Verify many signatures at once.
+
+        Args:
+            items (list): (message, signature, public_key) tuples.
+            unhex (bool): whether the messages should be unhexlified before verifying
+
+        Returns:
+            list: a bool per item, in the order of `items`.
+        """
+        return Crypto.VerifySignatures(items, unhex=unhex)
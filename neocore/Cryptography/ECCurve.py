@@ -5,13 +5,34 @@ Description:
 Usage:
     from neocore.Cryptography.ECCurve import ECCurve
 """
+import sys
+import hmac
 import random
+import hashlib
 import binascii
+import threading
 from mpmath.libmp import bitcount as _bitlength
 from logzero import logger
+from neocore.Cryptography.LRUCache import LRUCache
 
 modpow = pow
 
+# secp256r1 (NIST P-256) domain parameters
+SECP256R1_P = int("FFFFFFFF00000001000000000000000000000000FFFFFFFFFFFFFFFFFFFFFFFF", 16)
+SECP256R1_A = int("FFFFFFFF00000001000000000000000000000000FFFFFFFFFFFFFFFFFFFFFFFC", 16)
+SECP256R1_B = int("5AC635D8AA3A93E7B3EBBD55769886BC651D06B0CC53B0F63BCE3C3E27D2604B", 16)
+SECP256R1_GX = int("6B17D1F2E12C4247F8BCE6E563A440F277037D812DEB33A0F4A13945D898C296", 16)
+SECP256R1_GY = int("4FE342E2FE1A7F9B8EE7EB4A7C0F9E162BCE33576B315ECECBB6406837BF51F5", 16)
+SECP256R1_N = int("FFFFFFFF00000000FFFFFFFFFFFFFFFFBCE6FAADA7179E84F3B9CAC2FC632551", 16)
+
+# secp256k1 domain parameters
+SECP256K1_P = 2 ** 256 - 2 ** 32 - 977  # FFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEFFFFFC2F
+SECP256K1_A = 0
+SECP256K1_B = 7
+SECP256K1_GX = 0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798
+SECP256K1_GY = 0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8
+SECP256K1_N = 2 ** 256 - 432420386565659656852420866394968145599
+
 
 # (gcd,c,d)= GCD(a, b)  ===> a*c+b*d!=gcd:
 
@@ -23,9 +44,69 @@ def GCD(a, b):
     return (d1, y1 - (b // a) * x1, x1)
 
 
-def modinv(x, m):
+def _modinv_recursive(x, m):
+    """
+    modular inverse through the recursive GCD
+    """
     (gcd, c, d) = GCD(x, m)
-    return c
+    return c % m
+
+
+def _modinv_euclid(x, m):
+    """
+    modular inverse through the iterative extended euclidean algorithm
+    """
+    a, b = x % m, m
+    c0, c1 = 1, 0
+    while b:
+        q = a // b
+        a, b = b, a - q * b
+        c0, c1 = c1, c0 - q * c1
+    return c0 % m
+
+
+def _modinv_pow(x, m):
+    """
+    modular inverse through the built-in pow, available since python 3.8
+    """
+    try:
+        return pow(x, -1, m)
+    except ValueError:
+        # not invertible, keep the result of the other backends
+        return _modinv_euclid(x, m)
+
+
+def _has_pow_inverse():
+    try:
+        return pow(3, -1, 7) == 5
+    except (ValueError, TypeError):
+        return False
+
+
+# available implementations of `modinv`, see set_modinv_backend
+MODINV_BACKENDS = {
+    'recursive': _modinv_recursive,
+    'euclid': _modinv_euclid,
+}
+if _has_pow_inverse():
+    MODINV_BACKENDS['pow'] = _modinv_pow
+
+
+def set_modinv_backend(name):
+    """
+    select the implementation used for all modular inversions in this module
+
+    Args:
+        name (str): one of the keys of MODINV_BACKENDS.
+    """
+    global modinv
+    if name not in MODINV_BACKENDS:
+        raise ValueError("Unknown modinv backend: %s" % name)
+    modinv = MODINV_BACKENDS[name]
+
+
+# use the fastest backend available
+modinv = MODINV_BACKENDS['pow'] if 'pow' in MODINV_BACKENDS else _modinv_euclid
 
 
 def samefield(a, b):
@@ -43,6 +124,37 @@ def test_bit(num, index):
     return False
 
 
+def wnaf(scalar, width):
+    """
+    width-w non adjacent form of a non negative scalar, least significant digit first.
+    every non zero digit is odd and lies in (-2^(w-1), 2^(w-1)), and any w consecutive
+    digits contain at most one non zero digit.
+    """
+    digits = []
+    window = 1 << width
+    half = window >> 1
+    while scalar:
+        if scalar & 1:
+            digit = scalar & (window - 1)
+            if digit >= half:
+                digit -= window
+            scalar -= digit
+        else:
+            digit = 0
+        digits.append(digit)
+        scalar >>= 1
+    return digits
+
+
+def signed_wnaf(scalar, width):
+    """
+    width-w non adjacent form of any scalar, negative scalars get negated digits
+    """
+    if scalar < 0:
+        return [-d for d in wnaf(-scalar, width)]
+    return wnaf(scalar, width)
+
+
 def randbytes(n):
     for i in range(0, n):
         yield random.getrandbits(8)
@@ -185,6 +297,74 @@ def sqrtCQ(val, CQ):
     return None
 
 
+def _sqrt_3_mod_4(val, p):
+    """
+    square root for p = 3 (mod 4): a single exponentiation
+    """
+    root = pow(val, (p + 1) >> 2, p)
+    return root if root * root % p == val else None
+
+
+def _sqrt_5_mod_8(val, p):
+    """
+    square root for p = 5 (mod 8), Atkin's algorithm
+    """
+    v = pow(2 * val, (p - 5) >> 3, p)
+    i = 2 * val * v * v % p
+    root = val * v * (i - 1) % p
+    return root if root * root % p == val else None
+
+
+def _sqrt_tonelli_shanks(val, p):
+    """
+    square root for any odd prime p, Tonelli-Shanks algorithm
+    """
+    if val == 0:
+        return 0
+    if pow(val, (p - 1) >> 1, p) != 1:
+        return None
+
+    # p - 1 = q * 2^s with q odd
+    q = p - 1
+    s = 0
+    while q & 1 == 0:
+        q >>= 1
+        s += 1
+
+    # find a quadratic non residue
+    z = 2
+    while pow(z, (p - 1) >> 1, p) != p - 1:
+        z += 1
+
+    m = s
+    c = pow(z, q, p)
+    t = pow(val, q, p)
+    root = pow(val, (q + 1) >> 1, p)
+    while t != 1:
+        i = 1
+        t2 = t * t % p
+        while t2 != 1:
+            t2 = t2 * t2 % p
+            i += 1
+        b = pow(c, 1 << (m - i - 1), p)
+        m = i
+        c = b * b % p
+        t = t * c % p
+        root = root * b % p
+    return root
+
+
+def select_sqrt(p):
+    """
+    get the fastest square root function for the prime p
+    """
+    if p % 4 == 3:
+        return _sqrt_3_mod_4
+    if p % 8 == 5:
+        return _sqrt_5_mod_8
+    return _sqrt_tonelli_shanks
+
+
 class FiniteField:
     """
     FiniteField implements a value modulus a number.
@@ -193,47 +373,60 @@ class FiniteField:
     class Value:
         """
         represent a value in the FiniteField
-        this class forwards all operations to the FiniteField class
+        this class is a thin wrapper around a plain integer, the arithmetic is done
+        on the integers directly. The curve code works on plain integers internally
+        and only creates Value objects for the results it hands out.
         """
 
+        __slots__ = ('field', 'value')
+
         def __init__(self, field, value):
             self.field = field
             self.value = field.integer(value)
 
         # Value * int
         def __add__(self, rhs):
-            return self.field.add(self, self.field.value(rhs))
+            field = self.field
+            return field._new((self.value + field.integer(rhs)) % field.p)
 
         def __sub__(self, rhs):
-            return self.field.sub(self, self.field.value(rhs))
+            field = self.field
+            return field._new((self.value - field.integer(rhs)) % field.p)
 
         def __mul__(self, rhs):
-            return self.field.mul(self, self.field.value(rhs))
+            field = self.field
+            return field._new((self.value * field.integer(rhs)) % field.p)
 
         def __truediv__(self, rhs):
-            return self.field.div(self, self.field.value(rhs))
+            field = self.field
+            return field._new((self.value * modinv(field.integer(rhs), field.p)) % field.p)
 
         def __pow__(self, rhs):
             return self.field.pow(self, rhs)
 
         # int * Value
         def __radd__(self, rhs):
-            return self.field.add(self.field.value(rhs), self)
+            return self + rhs
 
         def __rsub__(self, rhs):
-            return self.field.sub(self.field.value(rhs), self)
+            field = self.field
+            return field._new((field.integer(rhs) - self.value) % field.p)
 
         def __rmul__(self, rhs):
-            return self.field.mul(self.field.value(rhs), self)
+            return self * rhs
 
-        def __rdiv__(self, rhs):
-            return self.field.div(self.field.value(rhs), self)
+        def __rtruediv__(self, rhs):
+            field = self.field
+            return field._new((field.integer(rhs) * modinv(self.value, field.p)) % field.p)
+
+        __rdiv__ = __rtruediv__
 
         def __rpow__(self, rhs):
             return self.field.pow(self.field.value(rhs), self)
 
         def __eq__(self, rhs):
-            return self.field.eq(self, self.field.value(rhs))
+            field = self.field
+            return (self.value - field.integer(rhs)) % field.p == 0
 
         def __ne__(self, rhs):
             return not (self == rhs)
@@ -242,7 +435,8 @@ class FiniteField:
             return "0x%s" % self.value
 
         def __neg__(self):
-            return self.field.neg(self)
+            field = self.field
+            return field._new(-self.value % field.p)
 
         def sqrt(self, flag):
             return self.field.sqrt(self, flag)
@@ -258,6 +452,7 @@ class FiniteField:
 
     def __init__(self, p):
         self.p = p
+        self._sqrt = select_sqrt(p)
 
     """
     several basic operators
@@ -284,28 +479,30 @@ class FiniteField:
     def neg(self, val):
         return self.value(self.p - val.value)
 
+    def modsqrt(self, x):
+        """
+        calculate a square root of the integer x modulus p
+
+        Returns:
+            int: the root, or None if x is not a quadratic residue.
+        """
+        return self._sqrt(x % self.p, self.p)
+
     def sqrt(self, val, flag):
         """
         calculate the square root modulus p
+        there are 2 possible solutions, `flag` selects the one with that parity
         """
         if val.iszero():
             return val
-        sw = self.p % 8
-        if sw == 3 or sw == 7:
-            res = val ** ((self.p + 1) / 4)
-        elif sw == 5:
-            x = val ** ((self.p + 1) / 4)
-            if x == 1:
-                res = val ** ((self.p + 3) / 8)
-            else:
-                res = (4 * val) ** ((self.p - 5) / 8) * 2 * val
-        else:
-            raise Exception("modsqrt non supported for (p%8)==1")
 
-        if res.value % 2 == flag:
-            return res
-        else:
-            return -res
+        res = self.modsqrt(val.value)
+        if res is None:
+            raise ValueError("%s has no square root modulus p" % val)
+
+        if res % 2 != flag:
+            res = self.p - res
+        return self._new(res)
 
     def inverse(self, value):
         """
@@ -313,6 +510,33 @@ class FiniteField:
         """
         return modinv(value.value, self.p)
 
+    def batch_inverse(self, values):
+        """
+        calculate the multiplicative inverse of many values at once
+        uses Montgomery's trick: a single modular inversion plus 3(n-1) multiplications.
+        like `inverse`, zero values map to 0.
+        """
+        p = self.p
+        values = [self.integer(v) % p for v in values]
+
+        # prefix products of the non zero values
+        prefix = []
+        accumulator = 1
+        for v in values:
+            prefix.append(accumulator)
+            if v:
+                accumulator = accumulator * v % p
+
+        inv = modinv(accumulator, p) % p
+
+        result = [0] * len(values)
+        for i in range(len(values) - 1, -1, -1):
+            v = values[i]
+            if v:
+                result[i] = inv * prefix[i] % p
+                inv = inv * v % p
+        return result
+
     def value(self, x):
         """
         converts an integer or FinitField.Value to a value of this FiniteField.
@@ -329,6 +553,15 @@ class FiniteField:
 
         return x.value if isinstance(x, FiniteField.Value) else x
 
+    def _new(self, x):
+        """
+        wrap a plain, already reduced, integer in a Value without any type checks
+        """
+        value = FiniteField.Value.__new__(FiniteField.Value)
+        value.field = self
+        value.value = x
+        return value
+
     def zero(self):
         """
         returns the additive identity value
@@ -344,6 +577,55 @@ class FiniteField:
         return FiniteField.Value(self, 1)
 
 
+class GLVEndomorphism:
+    """
+    efficiently computable endomorphism phi(x, y) = (beta*x, y) = lambda*(x, y) of a curve
+    it is used to split a scalar k in two halves k1 + k2*lambda = k (mod n) of about half
+    the bit length, so k*P = k1*P + k2*phi(P) needs only half the doublings (GLV method).
+    """
+
+    def __init__(self, beta, lam, n, a1, b1, a2, b2):
+        """
+        Args:
+            beta (int): cube root of unity modulus p.
+            lam (int): cube root of unity modulus n, matching beta.
+            n (int): the group order.
+            a1, b1, a2, b2 (int): short basis of the lattice {(x, y) | x + y*lam = 0 (mod n)}.
+        """
+        self.beta = beta
+        self.lam = lam
+        self.n = n
+        self.a1 = a1
+        self.b1 = b1
+        self.a2 = a2
+        self.b2 = b2
+
+    def split(self, k):
+        """
+        returns (k1, k2) with k1 + k2*lambda = k (mod n), both about half the size of n
+        """
+        n = self.n
+        k %= n
+        c1 = (self.b2 * k + (n >> 1)) // n
+        c2 = (-self.b1 * k + (n >> 1)) // n
+        k1 = k - c1 * self.a1 - c2 * self.a2
+        k2 = -c1 * self.b1 - c2 * self.b2
+        return k1, k2
+
+
+# endomorphisms of the curves that support the GLV method, keyed by (p, a, b)
+GLV_ENDOMORPHISMS = {
+    (SECP256K1_P, SECP256K1_A, SECP256K1_B): GLVEndomorphism(
+        beta=0x7AE96A2B657C07106E64479EAC3434E99CF0497512F58995C1396C28719501EE,
+        lam=0x5363AD4CC05C30E0A5261C028812645A122E22EA20816678DF02967C1B23BD72,
+        n=SECP256K1_N,
+        a1=0x3086D221A7D46BCDE86C90E49284EB15,
+        b1=-0xE4437ED6010E88286F547FA90ABFE4C3,
+        a2=0x114CA50F7A8E2F3F657C1108D9D44CFD8,
+        b2=0x3086D221A7D46BCDE86C90E49284EB15),
+}
+
+
 class EllipticCurve:
     """
     EllipticCurve implements a point on a elliptic curve
@@ -355,10 +637,57 @@ class EllipticCurve:
         this class forwards all operations to the EllipticCurve class
         """
 
+        __slots__ = ('curve', '_x', '_y', '_jacobian')
+
         def __init__(self, curve, x, y):
             self.curve = curve
-            self.x = x
-            self.y = y
+            self._x = x
+            self._y = y
+            self._jacobian = curve._to_jacobian(x.value, y.value)
+
+        @property
+        def x(self):
+            if self._x is None:
+                self._normalize()
+            return self._x
+
+        @x.setter
+        def x(self, value):
+            self._y = self.y
+            self._x = value
+            self._jacobian = self.curve._to_jacobian(value.value, self._y.value)
+
+        @property
+        def y(self):
+            if self._y is None:
+                self._normalize()
+            return self._y
+
+        @y.setter
+        def y(self, value):
+            self._x = self.x
+            self._y = value
+            self._jacobian = self.curve._to_jacobian(self._x.value, value.value)
+
+        def _copy(self):
+            """
+            an independent copy, so the points kept in `point_cache` are never handed out
+            and changed through the `x` and `y` setters
+            """
+            point = EllipticCurve.ECPoint.__new__(EllipticCurve.ECPoint)
+            point.curve = self.curve
+            point._x = self._x
+            point._y = self._y
+            point._jacobian = self._jacobian
+            return point
+
+        def _normalize(self):
+            """
+            convert the internal jacobian coordinates back to affine ones
+            """
+            x, y = self.curve._to_affine(self._jacobian)
+            self._x = self.curve.field._new(x)
+            self._y = self.curve.field._new(y)
 
         # Point + Point
 
@@ -422,14 +751,14 @@ class EllipticCurve:
             return self.curve.neg(self)
 
         def iszero(self):
-            return self.x.iszero() and self.y.iszero()
+            return self._jacobian[2] == 0
 
         def isoncurve(self):
             return self.curve.isoncurve(self)
 
         @property
         def IsInfinity(self):
-            return True if self == self.curve.Infinity else False
+            return self.iszero()
 
         def Size(self):
             if self.IsInfinity:
@@ -461,6 +790,18 @@ class EllipticCurve:
                 data = bytearray(b'\x04') + xbytes + ybytes
                 return binascii.hexlify(data)
 
+        def encode_point_raw(self, compressed=True):
+            """
+            encode the point as raw bytes, like `encode_point` without the hex encoding
+            """
+            if self.iszero():
+                return b'\x00'
+
+            x = self.x.value
+            if compressed:
+                return (b'\x02' if self.y.value % 2 == 0 else b'\x03') + x.to_bytes(32, 'big')
+            return b'\x04' + x.to_bytes(32, 'big') + self.y.value.to_bytes(32, 'big')
+
         def ToString(self):
             return binascii.hexlify(self.encode_point(compressed=True)).decode('utf-8')
 
@@ -468,17 +809,29 @@ class EllipticCurve:
             return binascii.hexlify(self.encode_point(compressed=True))
 
         def Serialize(self, writer, compress=True):
-            if self == self.curve.Infinity:
+            if self.iszero():
                 writer.WriteByte(b'\x00')
             else:
                 byt = self.encode_point(compressed=compress)
                 writer.WriteBytes(byt)
 
+    # default number of decoded points kept in `point_cache`
+    POINT_CACHE_SIZE = 4096
+
     def __init__(self, field, a, b):
         self.field = field
         self.a = field.value(a)
         self.b = field.value(b)
 
+        # decoded points keyed by their raw (33 or 65 byte) encoding, only valid points are stored.
+        # the cached points are shared between callers and must not be modified.
+        self.point_cache = LRUCache(self.POINT_CACHE_SIZE)
+        # plain integer copies of the parameters for the internal arithmetic
+        self._p = field.p
+        self._a = self.a.value
+        self._a_is_minus_3 = (self._a + 3) % field.p == 0
+        self._glv = GLV_ENDOMORPHISMS.get((field.p, self._a % field.p, self.b.value % field.p))
+
     @property
     def Infinity(self):
         return self.point(0, 0)
@@ -492,39 +845,172 @@ class EllipticCurve:
         if q.iszero():
             return p
 
-        lft = 0
-        # calculate the slope of the intersection line
-        if p == q:
-            if p.y == 0:
-                return self.zero()
-            lft = (3 * p.x ** 2 + self.a) / (2 * p.y)
-        elif p.x == q.x:
-            return self.zero()
-        else:
-            lft = (p.y - q.y) / (p.x - q.x)
-
-        # calculate the intersection point
-        x = lft ** 2 - (p.x + q.x)
-        y = lft * (p.x - x) - p.y
-        return self.point(x, y)
+        return self._from_jacobian(self._jacobian_add(p._jacobian, q._jacobian))
 
     # subtraction is :  a - b  =  a + -b
     def sub(self, lhs, rhs):
         return lhs + -rhs
 
-    # scalar multiplication is implemented like repeated addition
+    # window size in bits of the wNAF recoding used by mul and multiply_two
+    WNAF_WIDTH = 4
+
     def mul(self, pt, scalar):
+        """
+        scalar multiplication using the wNAF representation of the scalar
+        """
         scalar = self.field.integer(scalar)
-        accumulator = self.zero()
-        shifter = pt
+        return self._from_jacobian(self._jacobian_wnaf_mul(self._wnaf_terms(pt._jacobian, scalar)))
+
+    def multiply_two(self, P, a, Q, b):
+        """
+        calculate P*a + Q*b
+        uses Shamir's trick: both scalars are processed in the same loop, so
+        they share a single chain of doublings.
+        """
+        a = self.field.integer(a)
+        b = self.field.integer(b)
+        return self._from_jacobian(self._jacobian_wnaf_mul(
+            self._wnaf_terms(P._jacobian, a) + self._wnaf_terms(Q._jacobian, b)))
+
+    # below this number of terms multi_scalar_mul uses Straus, above it Pippenger
+    PIPPENGER_THRESHOLD = 32
+
+    def multi_scalar_mul(self, points, scalars):
+        """
+        calculate the sum of points[i] * scalars[i]
+        small inputs use Straus' method (interleaved wNAF with one chain of doublings),
+        large inputs use Pippenger's bucket method, which grows sub-linearly with the
+        number of terms.
+        """
+        if len(points) != len(scalars):
+            raise ValueError("points and scalars must have the same length")
+
+        pairs = []
+        for point, scalar in zip(points, scalars):
+            scalar = self.field.integer(scalar)
+            if scalar < 0:
+                point, scalar = -point, -scalar
+            if scalar and not point.iszero():
+                pairs.append((point._jacobian, scalar))
+
+        if not pairs:
+            return self.zero()
+
+        if len(pairs) < self.PIPPENGER_THRESHOLD:
+            terms = []
+            for P, scalar in pairs:
+                terms.extend(self._wnaf_terms(P, scalar))
+            return self._from_jacobian(self._jacobian_wnaf_mul(terms))
 
-        while scalar != 0:
-            bit = scalar % 2
-            if bit:
-                accumulator += shifter
-            shifter += shifter
-            scalar /= 2
+        return self._from_jacobian(self._jacobian_pippenger(pairs))
 
+    def _jacobian_pippenger(self, pairs):
+        """
+        Pippenger's bucket method over a list of (jacobian point, non negative scalar)
+        the scalars are recoded in signed c-bit digits, for every digit position the points
+        are sorted in 2^(c-1) buckets by the digit value and the buckets are combined with
+        a running sum.
+        """
+        add = self._jacobian_add
+        double = self._jacobian_double
+        infinity = self._jacobian_infinity
+        p = self._p
+
+        # the points are converted to affine once, so every bucket addition is a mixed addition
+        affine = self._batch_to_affine([P for P, scalar in pairs])
+        points = [((x, y, 1), (x, (p - y) % p, 1)) for x, y in affine]
+
+        # pick the window that minimizes the number of additions: windows * (n + 2^c)
+        n = len(pairs)
+        bits = max(scalar.bit_length() for P, scalar in pairs) + 1
+        c = min(range(2, 17), key=lambda c: ((bits + c - 1) // c) * (n + (1 << c)))
+        windows = (bits + c - 1) // c
+        size = 1 << c
+        half = size >> 1
+
+        # signed digits in (-2^(c-1), 2^(c-1)]
+        digits = []
+        for P, scalar in pairs:
+            recoded = []
+            for i in range(windows):
+                digit = scalar & (size - 1)
+                scalar >>= c
+                if digit > half:
+                    digit -= size
+                    scalar += 1
+                recoded.append(digit)
+            digits.append(recoded)
+
+        result = infinity
+        for w in range(windows - 1, -1, -1):
+            for i in range(c):
+                result = double(result)
+
+            buckets = [infinity] * (half + 1)
+            for (positive, negative), recoded in zip(points, digits):
+                digit = recoded[w]
+                if digit > 0:
+                    buckets[digit] = add(buckets[digit], positive)
+                elif digit < 0:
+                    buckets[-digit] = add(buckets[-digit], negative)
+
+            running = infinity
+            total = infinity
+            for digit in range(half, 0, -1):
+                running = add(running, buckets[digit])
+                total = add(total, running)
+            result = add(result, total)
+        return result
+
+    def _wnaf_terms(self, P, scalar):
+        """
+        get the (wnaf digits, odd multiples table) terms of scalar * P for _jacobian_wnaf_mul
+        on curves with a GLV endomorphism the scalar is split in two half length scalars,
+        the table of the second term is the endomorphism applied to the first table.
+        """
+        width = self.WNAF_WIDTH
+        table = self._odd_multiples(P, width)
+        glv = self._glv
+        if glv is None:
+            return [(signed_wnaf(scalar, width), table)]
+
+        k1, k2 = glv.split(scalar)
+        beta = glv.beta
+        p = self._p
+        endomorphism = dict((d, (beta * X % p, Y, Z)) for d, (X, Y, Z) in table.items())
+        return [(signed_wnaf(k1, width), table), (signed_wnaf(k2, width), endomorphism)]
+
+    def _odd_multiples(self, P, width):
+        """
+        precompute d*P for all odd d with |d| < 2^(width-1), keyed by d
+        negation is free, so the negative multiples are stored as well
+        """
+        p = self.field.p
+        table = {}
+        P2 = self._jacobian_double(P)
+        current = P
+        for d in range(1, 1 << (width - 1), 2):
+            X, Y, Z = current
+            table[d] = current
+            table[-d] = (X, (p - Y) % p, Z)
+            current = self._jacobian_add(current, P2)
+        return table
+
+    def _jacobian_wnaf_mul(self, terms):
+        """
+        calculate the sum of k_i*P_i given a list of (wnaf digits of k_i, odd multiples of P_i)
+        all terms share the same chain of doublings
+        """
+        add = self._jacobian_add
+        double = self._jacobian_double
+        accumulator = self._jacobian_infinity
+        length = max(len(digits) for digits, table in terms)
+        terms = [(digits + [0] * (length - len(digits)), table) for digits, table in terms]
+        for i in range(length - 1, -1, -1):
+            accumulator = double(accumulator)
+            for digits, table in terms:
+                if digits[i]:
+                    accumulator = add(accumulator, table[digits[i]])
         return accumulator
 
     def div(self, pt, scalar):
@@ -535,10 +1021,36 @@ class EllipticCurve:
         return pt * (1 / scalar)
 
     def eq(self, lhs, rhs):
-        return lhs.x == rhs.x and lhs.y == rhs.y
+        """
+        compare two points without converting them back to affine coordinates
+        """
+        if not isinstance(rhs, EllipticCurve.ECPoint):
+            return False
+
+        return self._jacobian_eq(lhs._jacobian, rhs._jacobian)
+
+    def _jacobian_eq(self, P, Q):
+        """
+        compare two jacobian triples
+        """
+        p = self._p
+        X1, Y1, Z1 = P
+        X2, Y2, Z2 = Q
+
+        if Z1 == 0 or Z2 == 0:
+            return Z1 == Z2
+
+        Z1Z1 = Z1 * Z1 % p
+        Z2Z2 = Z2 * Z2 % p
+        if (X1 * Z2Z2 - X2 * Z1Z1) % p != 0:
+            return False
+        return (Y1 * Z2Z2 * Z2 - Y2 * Z1Z1 * Z1) % p == 0
 
     def neg(self, pt):
-        return self.point(pt.x, -pt.y)
+        if pt.iszero():
+            return pt
+        X, Y, Z = pt._jacobian
+        return self._from_jacobian((X, (self.field.p - Y) % self.field.p, Z))
 
     def zero(self):
         """
@@ -553,21 +1065,169 @@ class EllipticCurve:
         """
         return EllipticCurve.ECPoint(self, self.field.value(x), self.field.value(y))
 
+    """
+    points are kept internally in jacobian coordinates (X, Y, Z), representing
+    the affine point (X / Z^2, Y / Z^3). This avoids a modular inversion in
+    every addition; the inversion is only done when the affine x or y is read.
+    The point at infinity is any triple with Z == 0.
+    """
+
+    _jacobian_infinity = (1, 1, 0)
+
+    def _to_jacobian(self, x, y):
+        """
+        convert affine integer coordinates to a jacobian triple
+        (0, 0) is the encoding used for the point at infinity
+        """
+        if x == 0 and y == 0:
+            return self._jacobian_infinity
+        return (x, y, 1)
+
+    def _to_affine(self, P):
+        """
+        convert a jacobian triple to affine integer coordinates
+        """
+        X, Y, Z = P
+        if Z == 0:
+            return 0, 0
+        if Z == 1:
+            return X, Y
+        p = self.field.p
+        zinv = modinv(Z, p)
+        zinv2 = zinv * zinv % p
+        return X * zinv2 % p, Y * zinv2 * zinv % p
+
+    def _batch_to_affine(self, triples):
+        """
+        convert many jacobian triples to affine integer coordinates with a single inversion
+        """
+        p = self.field.p
+        inverses = self.field.batch_inverse([Z for X, Y, Z in triples])
+        result = []
+        for (X, Y, Z), zinv in zip(triples, inverses):
+            if Z == 0:
+                result.append((0, 0))
+            else:
+                zinv2 = zinv * zinv % p
+                result.append((X * zinv2 % p, Y * zinv2 * zinv % p))
+        return result
+
+    def batch_normalize(self, points):
+        """
+        calculate the affine coordinates of many points at once
+        this shares one modular inversion between all points instead of one per point.
+        returns the points
+        """
+        pending = [pt for pt in points if pt._x is None]
+        if pending:
+            field = self.field
+            for pt, (x, y) in zip(pending, self._batch_to_affine([pt._jacobian for pt in pending])):
+                pt._x = field._new(x)
+                pt._y = field._new(y)
+        return points
+
+    def encode_points(self, points, compressed=True):
+        """
+        encode many points, see ECPoint.encode_point
+        """
+        return [pt.encode_point(compressed) for pt in self.batch_normalize(points)]
+
+    def _from_jacobian(self, P):
+        """
+        wrap a jacobian triple in an ECPoint, the affine coordinates are calculated on demand
+        """
+        pt = EllipticCurve.ECPoint.__new__(EllipticCurve.ECPoint)
+        pt.curve = self
+        pt._x = None
+        pt._y = None
+        pt._jacobian = P
+        return pt
+
+    def _jacobian_double(self, P):
+        """
+        point doubling in jacobian coordinates
+        """
+        X1, Y1, Z1 = P
+        if Z1 == 0 or Y1 == 0:
+            return self._jacobian_infinity
+
+        p = self._p
+        YY = Y1 * Y1 % p
+        ZZ = Z1 * Z1 % p
+        S = 4 * X1 * YY % p
+        if self._a_is_minus_3:
+            M = 3 * (X1 - ZZ) * (X1 + ZZ) % p
+        elif self._a == 0:
+            M = 3 * X1 * X1 % p
+        else:
+            M = (3 * X1 * X1 + self._a * ZZ * ZZ) % p
+        X3 = (M * M - 2 * S) % p
+        Y3 = (M * (S - X3) - 8 * YY * YY) % p
+        Z3 = 2 * Y1 * Z1 % p
+        return (X3, Y3, Z3)
+
+    def _jacobian_add(self, P, Q):
+        """
+        point addition in jacobian coordinates
+        """
+        X1, Y1, Z1 = P
+        X2, Y2, Z2 = Q
+        if Z1 == 0:
+            return Q
+        if Z2 == 0:
+            return P
+
+        p = self._p
+        Z1Z1 = Z1 * Z1 % p
+        if Z2 == 1:
+            U1 = X1
+            S1 = Y1
+        else:
+            Z2Z2 = Z2 * Z2 % p
+            U1 = X1 * Z2Z2 % p
+            S1 = Y1 * Z2 * Z2Z2 % p
+        U2 = X2 * Z1Z1 % p
+        S2 = Y2 * Z1 * Z1Z1 % p
+
+        H = (U2 - U1) % p
+        r = (S2 - S1) % p
+        if H == 0:
+            if r == 0:
+                return self._jacobian_double(P)
+            return self._jacobian_infinity
+
+        HH = H * H % p
+        HHH = H * HH % p
+        V = U1 * HH % p
+        X3 = (r * r - HHH - 2 * V) % p
+        Y3 = (r * (V - X3) - S1 * HHH) % p
+        Z3 = Z1 * Z2 * H % p
+        return (X3, Y3, Z3)
+
     def isoncurve(self, p):
         """
         verifies if a point is on the curve
         """
-        return p.iszero() or p.y ** 2 == p.x ** 3 + self.a * p.x + self.b
+        if p.iszero():
+            return True
+
+        # y^2 = x^3 + ax + b  with x = X/Z^2 and y = Y/Z^3, multiplied by Z^6
+        prime = self.field.p
+        X, Y, Z = p._jacobian
+        Z2 = Z * Z % prime
+        Z4 = Z2 * Z2 % prime
+        return (Y * Y - X * X * X - self.a.value * X * Z4 - self.b.value * Z4 * Z2) % prime == 0
 
     def decompress(self, x, flag):
         """
         calculate the y coordinate given only the x value.
         there are 2 possible solutions, use 'flag' to select.
         """
-        x = self.field.value(x)
-        ysquare = x ** 3 + self.a * x + self.b
+        p = self.field.p
+        x = self.field.integer(x) % p
+        ysquare = (x * x * x + self.a.value * x + self.b.value) % p
 
-        return self.point(x, ysquare.sqrt(flag))
+        return self.point(x, self.field.sqrt(self.field._new(ysquare), flag))
 
     def decode_from_reader(self, reader):
 
@@ -578,12 +1238,13 @@ class EllipticCurve:
 
         # these are compressed
         if f == 2 or f == 3:
-            yTilde = f & 1
-            data = bytearray(reader.ReadBytes(32))
-            data.reverse()
-            data.append(0)
-            X1 = int.from_bytes(data, 'little')
-            return self.decompress_from_curve(X1, yTilde)
+            data = reader.ReadBytes(32)
+            key = bytes([f]) + bytes(data)
+            point = self.point_cache.get(key)
+            if point is None:
+                point = self.decompress_from_curve(int.from_bytes(data, 'big'), f & 1)
+                self.point_cache.put(key, point)
+            return point._copy()
 
         # uncompressed or hybrid
         elif f == 4 or f == 6 or f == 7:
@@ -612,12 +1273,17 @@ class EllipticCurve:
         if f == 2 or f == 3:
             if len(ba) != expected_byte_len + 1:
                 raise Exception("Incorrrect length for encoding")
-            yTilde = f & 1
-            data = bytearray(ba[1:])
-            data.reverse()
-            data.append(0)
-            X1 = int.from_bytes(data, 'little')
-            return self.decompress_from_curve(X1, yTilde)
+            key = bytes(ba)
+            point = self.point_cache.get(key)
+            if point is None:
+                yTilde = f & 1
+                data = bytearray(ba[1:])
+                data.reverse()
+                data.append(0)
+                X1 = int.from_bytes(data, 'little')
+                point = self.decompress_from_curve(X1, yTilde)
+                self.point_cache.put(key, point)
+            return point._copy()
 
         # uncompressed or hybrid
         elif f == 4:
@@ -625,6 +1291,11 @@ class EllipticCurve:
             if len(ba) != (2 * expected_byte_len) + 1:
                 raise Exception("Incorrect length for compressed encoding")
 
+            key = bytes(ba)
+            point = self.point_cache.get(key)
+            if point is not None:
+                return point._copy()
+
             x_data = bytearray(ba[1:1 + expected_byte_len])
             x_data.reverse()
             x_data.append(0)
@@ -637,6 +1308,8 @@ class EllipticCurve:
             y = int.from_bytes(y_data, 'little')
 
             pnt = self.point(x, y)
+            if pnt.isoncurve():
+                self.point_cache.put(key, pnt._copy())
             return pnt
 
         elif f == 6 or f == 7:
@@ -645,6 +1318,50 @@ class EllipticCurve:
         else:
             raise Exception("Invalid point incoding: %s " % f)
 
+    def decompress_many(self, encodings):
+        """
+        decode many raw point encodings at once, e.g. all keys of a multisig script
+        accepts compressed (33 byte) and uncompressed (65 byte) encodings as bytes,
+        bytearray or memoryview. Every point is validated, invalid encodings raise
+        a ValueError naming their index. Decoded points go through `point_cache`,
+        the returned points are copies of the cached ones.
+
+        Returns:
+            list: the decoded points, in the order of `encodings`.
+        """
+        p = self.field.p
+        a = self._a
+        b = self.b.value
+        sqrt = self.field._sqrt
+        size = (p.bit_length() + 7) // 8
+        cache = self.point_cache
+
+        points = []
+        for i, encoding in enumerate(encodings):
+            key = bytes(encoding)
+            point = cache.get(key)
+            if point is None:
+                f = key[0] if key else None
+                if (f == 2 or f == 3) and len(key) == size + 1:
+                    x = int.from_bytes(key[1:], 'big')
+                    y = sqrt((x * x * x + a * x + b) % p, p) if x < p else None
+                    if y is None:
+                        raise ValueError("Invalid point encoding at index %d: x is not on the curve" % i)
+                    if y & 1 != f & 1:
+                        y = (p - y) % p
+                elif f == 4 and len(key) == 2 * size + 1:
+                    x = int.from_bytes(key[1:size + 1], 'big')
+                    y = int.from_bytes(key[size + 1:], 'big')
+                    if x >= p or y >= p or (y * y - x * x * x - a * x - b) % p != 0:
+                        raise ValueError("Invalid point encoding at index %d: point is not on the curve" % i)
+                else:
+                    raise ValueError("Invalid point encoding at index %d" % i)
+
+                point = self._from_jacobian((x, y, 1))
+                cache.put(key, point)
+            points.append(point._copy())
+        return points
+
     def decompress_from_curve(self, x, flag):
         """
         calculate the y coordinate given only the x value.
@@ -652,15 +1369,15 @@ class EllipticCurve:
         """
 
         cq = self.field.p
-        x = self.field.value(x)
+        x = self.field.integer(x)
 
-        ysquare = x ** 3 + self.a * x + self.b
+        ysquare = (x * x * x + self.a.value * x + self.b.value) % cq
 
-        ysquare_root = sqrtCQ(ysquare.value, cq)
+        ysquare_root = self.field.modsqrt(ysquare)
+        if ysquare_root is None:
+            raise ValueError("Invalid point encoding: x is not on the curve")
 
-        bit0 = 0
-        if ysquare_root % 2 is not 0:
-            bit0 = 1
+        bit0 = ysquare_root & 1
 
         if bit0 != flag:
             beta = (cq - ysquare_root) % cq
@@ -670,26 +1387,259 @@ class EllipticCurve:
         return self.point(x, beta)
 
 
+class FixedBaseTable:
+    """
+    precomputed multiples of a fixed point
+    the scalar is split in windows of `window` bits, for every window position i
+    the table holds j * 2^(window*i) * P for all j, so a multiplication needs
+    only one (mixed) addition per window and no doublings.
+    """
+
+    def __init__(self, point, bits, window=4):
+        self.point = point
+        self.curve = point.curve
+        self.bits = bits
+        self.window = window
+        self.mask = (1 << window) - 1
+        self.rows = []
+
+        curve = self.curve
+        base = point._jacobian
+        for i in range(0, (bits + window - 1) // window):
+            row = [None, base]
+            for j in range(2, 1 << window):
+                row.append(curve._jacobian_add(row[-1], base))
+            base = curve._jacobian_add(row[-1], base)
+            self.rows.append(row)
+
+        # store the table in affine form, so every addition in `multiply` is a mixed addition
+        points = curve._batch_to_affine([P for row in self.rows for P in row[1:]])
+        size = (1 << window) - 1
+        for i, row in enumerate(self.rows):
+            row[1:] = [curve._to_jacobian(x, y) for x, y in points[i * size:(i + 1) * size]]
+
+    def multiply(self, scalar):
+        """
+        calculate scalar * point, the scalar must be smaller than 2^bits
+        returns a jacobian triple
+        """
+        if scalar >> self.bits:
+            raise ValueError("scalar too large for this table")
+
+        add = self.curve._jacobian_add
+        mask = self.mask
+        window = self.window
+        accumulator = self.curve._jacobian_infinity
+        for row in self.rows:
+            digit = scalar & mask
+            if digit:
+                accumulator = add(accumulator, row[digit])
+            scalar >>= window
+        return accumulator
+
+    def mul(self, scalar):
+        """
+        calculate scalar * point
+        """
+        return self.curve._from_jacobian(self.multiply(scalar))
+
+    def size(self):
+        """
+        number of points stored in the table
+        """
+        return sum(len(row) - 1 for row in self.rows)
+
+    def memory_usage(self):
+        """
+        approximate number of bytes held by the table
+        """
+        total = sys.getsizeof(self.rows)
+        for row in self.rows:
+            total += sys.getsizeof(row)
+            for P in row[1:]:
+                total += sys.getsizeof(P) + sum(sys.getsizeof(c) for c in P)
+        return total
+
+
 class ECDSA:
     """
     Digital Signature Algorithm using Elliptic Curves
     """
 
+    # window size in bits of the lazily built generator table
+    GENERATOR_TABLE_WINDOW = 4
+
+    # window size in bits of the public key tables
+    KEY_TABLE_WINDOW = 4
+
+    # a table is built automatically for a public key once it was used in this many
+    # verifications, 0 disables the automatic tables
+    KEY_TABLE_THRESHOLD = 32
+
+    # maximum number of automatically built public key tables
+    KEY_TABLE_CACHE_SIZE = 8
+
+    # number of public keys for which the verification count is tracked
+    KEY_USAGE_CACHE_SIZE = 1024
+
+    # guards the lazy creation of the key table caches of all instances
+    _key_tables_init_lock = threading.Lock()
+
     def __init__(self, ec, G, n):
+        """
+        Args:
+            ec (EllipticCurve): the curve.
+            G (EllipticCurve.ECPoint): the generator.
+            n (int|FiniteField): the group order, or an existing field modulo the group order.
+        """
         self.ec = ec
         self.G = G
-        self.GFn = FiniteField(n)
+        self.GFn = n if isinstance(n, FiniteField) else FiniteField(n)
+        self._generator_table = None
+        # (pinned tables, automatic tables, usage counts, lock), created on first use
+        # so the many short lived instances of decoded keys stay cheap
+        self._key_table_caches = None
+
+    def __getstate__(self):
+        # the precomputed tables are rebuilt on first use, their lock can not be pickled
+        state = self.__dict__.copy()
+        state['_generator_table'] = None
+        state['_key_table_caches'] = None
+        return state
 
     @property
     def Curve(self):
         return self.ec
 
+    def generator_table(self):
+        """
+        get the precomputed multiples of the generator G, built on first use
+        """
+        table = self._generator_table
+        if table is None or table.point is not self.G:
+            table = FixedBaseTable(self.G, self.GFn.p.bit_length(), self.GENERATOR_TABLE_WINDOW)
+            self._generator_table = table
+        return table
+
+    def add_key_table(self, pubkey):
+        """
+        precompute the multiples of a public key, so verifying its signatures runs
+        at fixed-base speed. The table is kept until `remove_key_table` is called.
+        """
+        key = (pubkey.x.value, pubkey.y.value)
+        pinned, automatic, usage, lock = self._get_key_table_caches()
+        with lock:
+            table = pinned.get(key)
+            if table is None:
+                table = self._build_key_table(pubkey)
+                pinned[key] = table
+        return table
+
+    def remove_key_table(self, pubkey):
+        """
+        drop the table of a public key, returns True if there was one
+        """
+        if self._key_table_caches is None:
+            return False
+        key = (pubkey.x.value, pubkey.y.value)
+        pinned, automatic, usage, lock = self._key_table_caches
+        with lock:
+            found = pinned.pop(key, None) is not None
+        return found
+
+    def clear_key_tables(self):
+        """
+        drop all public key tables and usage counts
+        """
+        if self._key_table_caches is None:
+            return
+        pinned, automatic, usage, lock = self._key_table_caches
+        with lock:
+            pinned.clear()
+        automatic.clear()
+        usage.clear()
+
+    def key_table_stats(self):
+        """
+        report the public key tables
+
+        Returns:
+            dict: with the keys `pinned` and `automatic` (number of tables), `points`
+            (number of precomputed points) and `memory` (approximate size in bytes).
+        """
+        pinned, automatic = [], []
+        if self._key_table_caches is not None:
+            pinned_tables, automatic_tables, usage, lock = self._key_table_caches
+            with lock:
+                pinned = list(pinned_tables.values())
+            automatic = automatic_tables.values()
+        tables = pinned + automatic
+        return {
+            'pinned': len(pinned),
+            'automatic': len(automatic),
+            'points': sum(table.size() for table in tables),
+            'memory': sum(table.memory_usage() for table in tables),
+        }
+
+    def key_table(self, pubkey):
+        """
+        get the table of a public key, or None if it has none
+        counts the use of the key and builds a table once it reaches KEY_TABLE_THRESHOLD
+        """
+        if pubkey.iszero():
+            return None
+        caches = self._key_table_caches
+        if caches is None:
+            if not self.KEY_TABLE_THRESHOLD:
+                return None
+            caches = self._get_key_table_caches()
+        pinned, automatic, usage, lock = caches
+
+        key = (pubkey.x.value, pubkey.y.value)
+        table = pinned.get(key)
+        if table is not None:
+            return table
+        table = automatic.get(key)
+        if table is not None or not self.KEY_TABLE_THRESHOLD:
+            return table
+
+        count = usage.get(key, 0) + 1
+        if count < self.KEY_TABLE_THRESHOLD:
+            usage.put(key, count)
+            return None
+
+        table = self._build_key_table(pubkey)
+        automatic.put(key, table)
+        return table
+
+    def _get_key_table_caches(self):
+        """
+        get the key table caches, creating them on first use
+        """
+        caches = self._key_table_caches
+        if caches is None:
+            with ECDSA._key_tables_init_lock:
+                if self._key_table_caches is None:
+                    self._key_table_caches = ({}, LRUCache(self.KEY_TABLE_CACHE_SIZE),
+                                              LRUCache(self.KEY_USAGE_CACHE_SIZE), threading.Lock())
+                caches = self._key_table_caches
+        return caches
+
+    def _build_key_table(self, pubkey):
+        return FixedBaseTable(pubkey, self.GFn.p.bit_length(), self.KEY_TABLE_WINDOW)
+
+    def mul_generator(self, scalar):
+        """
+        calculate G*scalar using the generator table
+        """
+        return self.generator_table().mul(self.GFn.integer(scalar) % self.GFn.p)
+
     def calcpub(self, privkey):
         """
         calculate the public key for private key x
         return G*x
         """
-        return self.G * self.GFn.value(privkey)
+        return self.mul_generator(privkey)
 
     def sign(self, message, privkey, secret):
         """
@@ -697,16 +1647,120 @@ class ECDSA:
         for signsecret k, message m, privatekey x
         return (G*k,  (m+x*r)/k)
         """
-        m = self.GFn.value(message)
-        x = self.GFn.value(privkey)
-        k = self.GFn.value(secret)
+        n = self.GFn.p
+        m = self.GFn.integer(message)
+        x = self.GFn.integer(privkey)
+        k = self.GFn.integer(secret)
+
+        R = self.mul_generator(k)
 
-        R = self.G * k
+        r = R.x.value % n
+        s = (m + x * r) * modinv(k, n) % n
 
-        r = self.GFn.value(R.x)
-        s = (m + x * r) / k
+        return (self.GFn._new(r), self.GFn._new(s))
 
-        return (r, s)
+    def deterministic_secrets(self, digest, privkey):
+        """
+        generate the sign secrets for a message digest and private key as described in
+        RFC 6979 with HMAC-SHA256, the first value is the secret, the following ones are
+        only needed in the rare case the secret gives r == 0 or s == 0
+        """
+        n = self.GFn.p
+        qlen = n.bit_length()
+        rolen = (qlen + 7) // 8
+
+        def bits2int(data):
+            value = int.from_bytes(data, 'big')
+            if len(data) * 8 > qlen:
+                value >>= len(data) * 8 - qlen
+            return value
+
+        def mac(key, data):
+            return hmac.new(key, data, hashlib.sha256).digest()
+
+        x = self.GFn.integer(privkey).to_bytes(rolen, 'big')
+        h = (bits2int(digest) % n).to_bytes(rolen, 'big')
+
+        V = b'\x01' * 32
+        K = b'\x00' * 32
+        K = mac(K, V + b'\x00' + x + h)
+        V = mac(K, V)
+        K = mac(K, V + b'\x01' + x + h)
+        V = mac(K, V)
+
+        while True:
+            T = b''
+            while len(T) < rolen:
+                V = mac(K, V)
+                T += V
+            k = bits2int(T)
+            if 0 < k < n:
+                yield k
+            K = mac(K, V + b'\x00')
+            V = mac(K, V)
+
+    def sign_deterministic(self, digest, privkey):
+        """
+        sign a message digest with the RFC 6979 secret, using the generator table
+        s is normalized to the lower half of the group order
+        returns (r, s) as integers
+        """
+        n = self.GFn.p
+        x = self.GFn.integer(privkey)
+        if not 0 < x < n:
+            raise ValueError("Invalid private key")
+
+        m = self._digest_int(digest)
+        for k in self.deterministic_secrets(digest, x):
+            r = self.mul_generator(k).x.value % n
+            if r == 0:
+                continue
+            s = (m + x * r) * modinv(k, n) % n
+            if s == 0:
+                continue
+            if s > n >> 1:
+                s = n - s
+            return r, s
+
+    def sign_deterministic_many(self, digests, privkey):
+        """
+        sign many message digests with the same private key, like `sign_deterministic`
+        the R points and the secrets are each inverted with a single batch inversion.
+        returns a list of (r, s) integer tuples
+        """
+        n = self.GFn.p
+        x = self.GFn.integer(privkey)
+        if not 0 < x < n:
+            raise ValueError("Invalid private key")
+
+        digests = list(digests)
+        secrets = [next(self.deterministic_secrets(digest, x)) for digest in digests]
+        table = self.generator_table()
+        points = self.ec._batch_to_affine([table.multiply(k) for k in secrets])
+        inverses = self.GFn.batch_inverse(secrets)
+
+        signatures = []
+        for digest, (Rx, Ry), w in zip(digests, points, inverses):
+            r = Rx % n
+            s = (self._digest_int(digest) + x * r) * w % n
+            if r == 0 or s == 0:
+                # the first secret is unusable, take the slow path through the next ones
+                signatures.append(self.sign_deterministic(digest, x))
+                continue
+            if s > n >> 1:
+                s = n - s
+            signatures.append((r, s))
+        return signatures
+
+    def _digest_int(self, digest):
+        """
+        convert a message digest to an integer, keeping the leftmost bits of the group order length
+        """
+        qlen = self.GFn.p.bit_length()
+        m = int.from_bytes(digest, 'big')
+        if len(digest) * 8 > qlen:
+            m >>= len(digest) * 8 - qlen
+        return m
 
     def verify(self, message, pubkey, rnum, snum):
         """
@@ -724,11 +1778,21 @@ class ECDSA:
             r == xcoord[ (G*m + Y*r)/s) ]
 
         """
-        m = self.GFn.value(message)
-        r = self.GFn.value(rnum)
-        s = self.GFn.value(snum)
-
-        R = self.G * (m / s) + pubkey * (r / s)
+        n = self.GFn.p
+        m = self.GFn.integer(message)
+        r = self.GFn.integer(rnum)
+        s = self.GFn.integer(snum)
+
+        if not (0 < r < n and 0 < s < n) or pubkey.iszero():
+            return False
+
+        w = modinv(s, n)
+        table = self.key_table(pubkey)
+        if table is None:
+            R = self.ec.multiply_two(self.G, m * w % n, pubkey, r * w % n)
+        else:
+            R = self.ec._from_jacobian(self.ec._jacobian_add(
+                self.generator_table().multiply(m * w % n), table.multiply(r * w % n)))
 
         # alternative methods of verifying
         # RORG= self.ec.decompress(r, 0)
@@ -737,7 +1801,156 @@ class ECDSA:
         # print "#2: %s .. %s"  % (RR*(1/s), r)
         # print "#3: %s .. %s"  % (R, r)
 
-        return R.x == r
+        if R.iszero():
+            return False
+
+        return R.x.value % n == r
+
+    # number of signatures combined in one randomized batch check, every check
+    # has to try the 2^size possible signs of the R points
+    BATCH_VERIFY_SIZE = 6
+
+    # bit length of the random coefficients of the batch check
+    BATCH_VERIFY_RANDOM_BITS = 64
+
+    _batch_random = random.SystemRandom()
+
+    def verify_batch(self, items):
+        """
+        verify many signatures at once
+
+        the signatures are checked in groups with a random linear combination:
+            sum(z_i * (G*u1_i + Y_i*u2_i)) == sum(+-z_i * R_i)
+        with u1 = m/s, u2 = r/s and R_i the point with x coordinate r_i. A signature only
+        holds r = xcoord(R), so the sign of every R_i is unknown and all sign combinations
+        are tried. Groups that fail are split in halves until the invalid signatures are
+        isolated, single signatures are checked with `verify`.
+
+        Args:
+            items (list): (message, pubkey, r, s) tuples, see `verify`.
+
+        Returns:
+            list: a bool per item.
+        """
+        n = self.GFn.p
+        results = [False] * len(items)
+
+        candidates = []
+        for index, (message, pubkey, rnum, snum) in enumerate(items):
+            r = self.GFn.integer(rnum)
+            s = self.GFn.integer(snum)
+            if 0 < r < n and 0 < s < n and not pubkey.iszero():
+                candidates.append((index, self.GFn.integer(message), pubkey, r, s))
+
+        prepared = []
+        inverses = self.GFn.batch_inverse([s for index, m, pubkey, r, s in candidates])
+        for (index, m, pubkey, r, s), w in zip(candidates, inverses):
+            try:
+                R = self.ec.decompress_from_curve(r, 0)._jacobian
+            except ValueError:
+                # r is not an x coordinate, R.x may still be r + n
+                results[index] = self.verify(m, pubkey, r, s)
+                continue
+            prepared.append((index, m, pubkey, r, s, m * w % n, r * w % n, R))
+
+        size = self.BATCH_VERIFY_SIZE
+        for i in range(0, len(prepared), size):
+            self._verify_group(prepared[i:i + size], results)
+
+        return results
+
+    def _verify_group(self, group, results):
+        """
+        batch check a group of prepared signatures, bisect if the check fails
+        """
+        if len(group) == 1:
+            index, m, pubkey, r, s, u1, u2, R = group[0]
+            results[index] = self.verify(m, pubkey, r, s)
+        elif self._batch_check(group):
+            for item in group:
+                results[item[0]] = True
+        else:
+            half = len(group) // 2
+            self._verify_group(group[:half], results)
+            self._verify_group(group[half:], results)
+
+    def _batch_check(self, group):
+        """
+        check sum(z_i * (G*u1_i + Y_i*u2_i)) == sum(+-z_i * R_i) for random z_i
+        """
+        ec = self.ec
+        n = self.GFn.p
+        p = ec._p
+        add = ec._jacobian_add
+        bits = self.BATCH_VERIFY_RANDOM_BITS
+
+        # scaling the whole equation does not change it, so the first coefficient is 1
+        zs = [1] + [self._batch_random.getrandbits(bits) | 1 for item in group[1:]]
+
+        # left side: one fixed base multiplication plus a joint multiplication of the keys
+        g = sum(z * item[5] for z, item in zip(zs, group)) % n
+        lhs = self.generator_table().multiply(g)
+        terms = []
+        for z, item in zip(zs, group):
+            table = self.key_table(item[2])
+            if table is None:
+                terms.extend(ec._wnaf_terms(item[2]._jacobian, z * item[6] % n))
+            else:
+                lhs = add(lhs, table.multiply(z * item[6] % n))
+        if terms:
+            lhs = add(lhs, ec._jacobian_wnaf_mul(terms))
+
+        # right side: z_i * R_i, walk all sign combinations in gray code order
+        # so every step flips a single sign, i.e. adds or subtracts 2 * z_i * R_i
+        rhs = ec._jacobian_infinity
+        flips = []
+        for z, item in zip(zs, group):
+            T = ec._jacobian_wnaf_mul(ec._wnaf_terms(item[7], z))
+            rhs = add(rhs, T)
+            X, Y, Z = ec._jacobian_double(T)
+            flips.append(((X, (p - Y) % p, Z), (X, Y, Z)))
+
+        signs = [0] * len(group)
+        if ec._jacobian_eq(lhs, rhs):
+            return True
+        for step in range(1, 1 << len(group)):
+            j = (step & -step).bit_length() - 1
+            rhs = add(rhs, flips[j][signs[j]])
+            signs[j] ^= 1
+            if ec._jacobian_eq(lhs, rhs):
+                return True
+        return False
+
+    def decode_public_key(self, public_key):
+        """
+        get the point of a public key on this curve
+
+        Args:
+            public_key (ECPoint|bytes): a point, or its raw encoding: 33 byte compressed,
+                65 byte uncompressed or the 64 byte x and y coordinates.
+
+        Raises:
+            ValueError: if the key is not a valid point on this curve.
+
+        Returns:
+            EllipticCurve.ECPoint: the point, decoded points are cached by the curve.
+        """
+        if isinstance(public_key, EllipticCurve.ECPoint):
+            curve = public_key.curve
+            if curve is not self.ec:
+                # an equal curve built separately, move the point over to this one
+                if (curve.field.p, curve.a.value, curve.b.value) != (self.ec.field.p, self.ec.a.value, self.ec.b.value):
+                    raise ValueError("public key is not a point of this curve")
+                if public_key.iszero():
+                    raise ValueError("public key is not a valid point")
+                public_key = self.ec.point(public_key.x.value, public_key.y.value)
+            if public_key.iszero() or not public_key.isoncurve():
+                raise ValueError("public key is not a valid point")
+            return public_key
+
+        if len(public_key) == 64:
+            public_key = b'\x04' + bytes(public_key)
+        return self.ec.decompress_many([public_key])[0]
 
     def findpk(self, message, rnum, snum, flag):
         """
@@ -745,14 +1958,16 @@ class ECDSA:
         Y = (R*s-G*m)/r
         note that there are 2 pubkeys related to a signature
         """
-        m = self.GFn.value(message)
-        r = self.GFn.value(rnum)
-        s = self.GFn.value(snum)
+        n = self.GFn.p
+        m = self.GFn.integer(message)
+        r = self.GFn.integer(rnum)
+        s = self.GFn.integer(snum)
 
         R = self.ec.decompress(r, flag)
 
         # return (R*s - self.G * m)*(1/r)
-        return R * (s / r) - self.G * (m / r)
+        rinv = modinv(r, n)
+        return self.ec.multiply_two(R, s * rinv % n, -self.G, m * rinv % n)
 
     def findpk2(self, r1, s1, r2, s2, flag1, flag2):
         """
@@ -804,42 +2019,31 @@ class ECDSA:
     @staticmethod
     def secp256r1():
         """
-        create the secp256r1 curve
+        get the secp256r1 curve
+        the instance comes from the process wide curve registry and must be treated as read-only
         """
-        GFp = FiniteField(int("FFFFFFFF00000001000000000000000000000000FFFFFFFFFFFFFFFFFFFFFFFF", 16))
-        ec = EllipticCurve(GFp, 115792089210356248762697446949407573530086143415290314195533631308867097853948, 41058363725152142129326129780047268409114441015993725554835256314039467401291)
-        # return ECDSA(GFp, ec.point(0x6B17D1F2E12C4247F8BCE6E563A440F277037D812DEB33A0F4A13945D898C296,0x4FE342E2FE1A7F9B8EE7EB4A7C0F9E162BCE33576B315ECECBB6406837BF51F5),int("FFFFFFFF00000001000000000000000000000000FFFFFFFFFFFFFFFFFFFFFFFC", 16))
-        return ECDSA(ec,
-                     ec.point(0x6B17D1F2E12C4247F8BCE6E563A440F277037D812DEB33A0F4A13945D898C296, 0x4FE342E2FE1A7F9B8EE7EB4A7C0F9E162BCE33576B315ECECBB6406837BF51F5),
-                     GFp)
+        return named_curve('secp256r1')
 
     @staticmethod
     def decode_secp256r1(str, unhex=True, check_on_curve=True):
         """
         decode a public key on the secp256r1 curve
         """
+        curve = named_curve('secp256r1')
 
-        GFp = FiniteField(int("FFFFFFFF00000001000000000000000000000000FFFFFFFFFFFFFFFFFFFFFFFF", 16))
-        ec = EllipticCurve(GFp, 115792089210356248762697446949407573530086143415290314195533631308867097853948,
-                           41058363725152142129326129780047268409114441015993725554835256314039467401291)
-
-        point = ec.decode_from_hex(str, unhex=unhex)
+        point = curve.ec.decode_from_hex(str, unhex=unhex)
 
         if check_on_curve:
             if point.isoncurve():
-                return ECDSA(GFp, point, int("FFFFFFFF00000001000000000000000000000000FFFFFFFFFFFFFFFFFFFFFFFC", 16))
+                return ECDSA(curve.ec, point, curve.GFn)
             else:
                 raise Exception("Could not decode string")
 
-        return ECDSA(GFp, point, int("FFFFFFFF00000001000000000000000000000000FFFFFFFFFFFFFFFFFFFFFFFC", 16))
+        return ECDSA(curve.ec, point, curve.GFn)
 
     @staticmethod
     def Deserialize_Secp256r1(reader):
-        GFp = FiniteField(int("FFFFFFFF00000001000000000000000000000000FFFFFFFFFFFFFFFFFFFFFFFF", 16))
-        ec = EllipticCurve(GFp, 115792089210356248762697446949407573530086143415290314195533631308867097853948,
-                           41058363725152142129326129780047268409114441015993725554835256314039467401291)
-
-        return ec.decode_from_reader(reader)
+        return named_curve('secp256r1').ec.decode_from_reader(reader)
 
     @staticmethod
     def FromBytes_Secp256r1(pubkey):
@@ -863,20 +2067,68 @@ class ECDSA:
     @staticmethod
     def secp256k1():
         """
-        create the secp256k1 curve
+        get the secp256k1 curve
+        the instance comes from the process wide curve registry and must be treated as read-only
         """
-        GFp = FiniteField(2 ** 256 - 2 ** 32 - 977)  # This is P from below... aka FFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEFFFFFC2F
-        ec = EllipticCurve(GFp, 0, 7)
-        return ECDSA(ec, ec.point(0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798, 0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8), 2 ** 256 - 432420386565659656852420866394968145599)
+        return named_curve('secp256k1')
 
     @staticmethod
     def SignSecp256R1(message, prikey, pubkey):
+        """
+        sign a message with the RFC 6979 secret on the shared secp256r1 context
+        the message is an integer, messages longer than the group order keep their leftmost bits
+        `pubkey` is not needed for signing, it is kept for compatibility
+        """
+        curve = named_curve('secp256r1')
+
+        m = curve.GFn.integer(message)
+        digest = m.to_bytes(max(32, (m.bit_length() + 7) // 8), 'big')
+        secret = next(curve.deterministic_secrets(digest, prikey))
+
+        return curve.sign(curve._digest_int(digest), prikey, secret)
+
 
-        GFp = FiniteField(int("FFFFFFFF00000001000000000000000000000000FFFFFFFFFFFFFFFFFFFFFFFF", 16))
-        ec = EllipticCurve(GFp, 115792089210356248762697446949407573530086143415290314195533631308867097853948, 41058363725152142129326129780047268409114441015993725554835256314039467401291)
+def _create_secp256r1():
+    GFp = FiniteField(SECP256R1_P)
+    ec = EllipticCurve(GFp, SECP256R1_A, SECP256R1_B)
+    return ECDSA(ec, ec.point(SECP256R1_GX, SECP256R1_GY), SECP256R1_N)
 
-        edcsa = ECDSA(ec, ec.point(pubkey.x.value, pubkey.y.value), GFp)
 
-        res = edcsa.sign(message, prikey)
+def _create_secp256k1():
+    GFp = FiniteField(SECP256K1_P)
+    ec = EllipticCurve(GFp, SECP256K1_A, SECP256K1_B)
+    return ECDSA(ec, ec.point(SECP256K1_GX, SECP256K1_GY), SECP256K1_N)
 
-        return res
+
+# factories of the curves known to `named_curve`
+CURVE_FACTORIES = {
+    'secp256r1': _create_secp256r1,
+    'secp256k1': _create_secp256k1,
+}
+
+_curve_registry = {}
+_curve_registry_lock = threading.Lock()
+
+
+def named_curve(name):
+    """
+    get the ECDSA context of a named curve
+    every curve is created once per process and shared by all callers, together with any
+    precomputation attached to it (e.g. the generator table). Treat the result as read-only.
+
+    Args:
+        name (str): one of the keys of CURVE_FACTORIES.
+
+    Returns:
+        ECDSA: the shared curve context.
+    """
+    curve = _curve_registry.get(name)
+    if curve is None:
+        with _curve_registry_lock:
+            curve = _curve_registry.get(name)
+            if curve is None:
+                if name not in CURVE_FACTORIES:
+                    raise ValueError("Unknown curve: %s" % name)
+                curve = CURVE_FACTORIES[name]()
+                _curve_registry[name] = curve
+    return curve
@@ -16,6 +16,11 @@ long = int
 
 ADDRESS_VERSION = 23
 
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+# every pair of base58 digits, indexed by its value
+_BASE58_PAIRS = [a + b for a in BASE58_ALPHABET for b in BASE58_ALPHABET]
+
 
 def random_key():
     # Gotta be secure after that java.SecureRandom fiasco...
@@ -55,6 +60,19 @@ def pubkey_to_redeem(pubkey):
     return binascii.unhexlify(b'21' + pubkey + b'ac')
 
 
+def pubkey_bytes_to_redeem(pubkey):
+    """
+    Convert the raw public key to the redeemscript format.
+
+    Args:
+        pubkey (bytes): 33 byte compressed public key.
+
+    Returns:
+        bytes: redeemscript.
+    """
+    return b'\x21' + pubkey + b'\xac'
+
+
 def redeem_to_scripthash(redeem):
     """
     Convert a redeem script to a script hash.
@@ -78,10 +96,8 @@ def scripthash_to_address(scripthash):
     Returns:
         str: base58 encoded string representing the wallet address.
     """
-    sb = bytearray([ADDRESS_VERSION]) + scripthash
-    c256 = bin_dbl_sha256(sb)[0:4]
-    outb = sb + bytearray(c256)
-    return base58.b58encode(bytes(outb)).decode("utf-8")
+    sb = bytes([ADDRESS_VERSION]) + bytes(scripthash)
+    return base58_encode(sb + bin_dbl_sha256(sb)[0:4])
 
 
 def pubkey_to_pubhash(pubkey):
@@ -171,6 +187,29 @@ def base256_encode(n, minwidth=0):  # int/long to byte array
     return b
 
 
+def base58_encode(data):
+    """
+    Encode the input with base58, like `base58.b58encode`. Two digits are produced per
+    division, which halves the number of big integer divisions.
+
+    Args:
+        data (bytes): input value.
+
+    Returns:
+        str: base58 encoded string.
+    """
+    n = int.from_bytes(data, 'big')
+    pairs = []
+    while n:
+        n, pair = divmod(n, 58 * 58)
+        pairs.append(_BASE58_PAIRS[pair])
+    encoded = ''.join(reversed(pairs)).lstrip('1')
+
+    # every leading zero byte is encoded as a '1'
+    zeros = len(data) - len(data.lstrip(b'\x00'))
+    return '1' * zeros + encoded
+
+
 def xor_bytes(a, b):
     """
     XOR on two bytes objects
@@ -0,0 +1,135 @@
+# -*- coding:utf-8 -*-
+"""
+Description:
+    Bounded least recently used cache
+Usage:
+    from neocore.Cryptography.LRUCache import LRUCache
+"""
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    A bounded, thread safe mapping that evicts the least recently used entry when full.
+    """
+
+    def __init__(self, max_size=1024):
+        """
+        Create an instance.
+
+        Args:
+            max_size (int): maximum number of entries. 0 disables the cache.
+        """
+        if max_size < 0:
+            raise ValueError("max_size must not be negative")
+
+        self._max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+    def get(self, key, default=None):
+        """
+        Get the value stored for `key` and mark it as recently used.
+
+        Args:
+            key: a hashable key.
+            default: returned when `key` is not in the cache.
+
+        Returns:
+            the cached value or `default`.
+        """
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Store `value` for `key`, evicting the least recently used entries if needed.
+
+        Args:
+            key: a hashable key.
+            value: the value to store.
+        """
+        with self._lock:
+            if self._max_size == 0:
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self._max_size:
+                self._data.popitem(last=False)
+
+    def resize(self, max_size):
+        """
+        Change the maximum number of entries, evicting entries if needed.
+
+        Args:
+            max_size (int): maximum number of entries. 0 disables the cache.
+        """
+        if max_size < 0:
+            raise ValueError("max_size must not be negative")
+
+        with self._lock:
+            self._max_size = max_size
+            while len(self._data) > max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all entries and reset the statistics.
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def values(self):
+        """
+        Get a snapshot of the cached values, from least to most recently used.
+        Does not change the order or the statistics.
+
+        Returns:
+            list: the values.
+        """
+        with self._lock:
+            return list(self._data.values())
+
+    def stats(self):
+        """
+        Get the cache statistics.
+
+        Returns:
+            dict: with the keys `hits`, `misses`, `size` and `max_size`.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._data),
+                'max_size': self._max_size,
+            }
+
+    def __getstate__(self):
+        # the lock can not be pickled, entries are not worth copying
+        return {'max_size': self._max_size}
+
+    def __setstate__(self, state):
+        self.__init__(state['max_size'])
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
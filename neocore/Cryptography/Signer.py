@@ -0,0 +1,62 @@
+# -*- coding:utf-8 -*-
+"""
+Description:
+    Signing context for many signatures with one private key
+Usage:
+    from neocore.Cryptography.Signer import Signer
+"""
+import hashlib
+from .ECCurve import ECDSA
+
+
+class Signer(object):
+    """
+    Signs messages with the private key of a KeyPair.
+
+    The private key is parsed once and the curve with its generator table is shared, so a
+    signature costs only the nonce derivation and one fixed-base multiplication. The
+    signatures are the same as those of `Crypto.Sign`.
+    """
+
+    def __init__(self, keypair):
+        """
+        Create an instance.
+
+        Args:
+            keypair (neocore.KeyPair.KeyPair): the key pair to sign with.
+        """
+        self.PublicKey = keypair.PublicKey
+        self.PublicKeyHash = keypair.PublicKeyHash
+
+        self._curve = ECDSA.secp256r1()
+        self._privkey = int.from_bytes(bytes(keypair.PrivateKey), 'big')
+
+    def sign(self, message):
+        """
+        Sign a message.
+
+        Args:
+            message (bytes): the raw message.
+
+        Returns:
+            bytearray: the 64 byte signature of the message.
+        """
+        r, s = self._curve.sign_deterministic(hashlib.sha256(message).digest(), self._privkey)
+        return self._encode(r, s)
+
+    def sign_many(self, messages):
+        """
+        Sign many messages, sharing the modular inversions between them.
+
+        Args:
+            messages (iterable): the raw messages.
+
+        Returns:
+            list: the 64 byte signature of every message, in the order of `messages`.
+        """
+        digests = [hashlib.sha256(message).digest() for message in messages]
+        return [self._encode(r, s) for r, s in self._curve.sign_deterministic_many(digests, self._privkey)]
+
+    @staticmethod
+    def _encode(r, s):
+        return bytearray(r.to_bytes(32, 'big') + s.to_bytes(32, 'big'))
@@ -0,0 +1,166 @@
+# -*- coding:utf-8 -*-
+"""
+Description:
+    Parallel signature verification on a pool of processes
+Usage:
+    from neocore.Cryptography.VerificationExecutor import VerificationExecutor
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from .Crypto import Crypto
+from .ECCurve import EllipticCurve
+
+
+def _verify_chunk(backend, chunk):
+    """
+    Verify a chunk of signatures in a worker process.
+
+    Args:
+        backend (str): the verification backend of the submitting process.
+        chunk (list): (digest, signature, public_key) tuples of raw bytes.
+
+    Returns:
+        list: a bool per item.
+    """
+    if Crypto._VerificationBackend != backend:
+        Crypto.SetVerificationBackend(backend)
+    return Crypto.verify_digests(chunk)
+
+
+class VerificationExecutor(object):
+    """
+    Verifies batches of signatures on a pool of worker processes, so the work is not
+    bound to the single core the GIL allows.
+
+    Small batches are verified in the calling process, where starting the work on
+    the pool would cost more than it saves.
+
+    Signatures found in the verification cache of `Crypto` are answered without the
+    workers, and successful verifications of the workers are added to it.
+    """
+
+    def __init__(self, workers=None, chunk_size=64, serial_threshold=None):
+        """
+        Create an instance.
+
+        Args:
+            workers (int): number of worker processes. Defaults to the number of CPUs.
+            chunk_size (int): number of signatures sent to a worker at once.
+            serial_threshold (int): batches smaller than this are verified in the calling process.
+                Defaults to twice `chunk_size`.
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.serial_threshold = 2 * chunk_size if serial_threshold is None else serial_threshold
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    def verify(self, items, unhex=True):
+        """
+        Verify many signatures.
+
+        Args:
+            items (list): (message, signature, public_key) tuples, see `Crypto.VerifySignature`.
+            unhex (bool): whether the messages should be unhexlified before verifying
+
+        Returns:
+            list: a bool per item, in the order of `items`.
+        """
+        return list(self.imap(items, unhex=unhex))
+
+    def imap(self, items, unhex=True):
+        """
+        Verify many signatures, yielding the results in the order of `items` as the
+        chunks complete.
+
+        Args:
+            items (list): (message, signature, public_key) tuples, see `Crypto.VerifySignature`.
+            unhex (bool): whether the messages should be unhexlified before verifying
+
+        Yields:
+            bool: the result of every item.
+        """
+        items = list(items)
+        if self.workers == 1 or len(items) < self.serial_threshold:
+            for result in Crypto.VerifySignatures(items, unhex=unhex):
+                yield result
+            return
+
+        compact = [self._compact(message, signature, public_key, unhex) for message, signature, public_key in items]
+
+        # the verification cache lives in this process, only its misses are sent to the workers
+        cache = Crypto._VerificationCache
+        cache_keys = [Crypto._VerificationCacheKey(digest, signature, public_key) for digest, signature, public_key in compact]
+        results = [None] * len(compact)
+        pending = []
+        for index, cache_key in enumerate(cache_keys):
+            if cache_key is not None and cache.get(cache_key):
+                results[index] = True
+            else:
+                pending.append(index)
+
+        next_index = 0
+        if pending:
+            chunks = [pending[i:i + self.chunk_size] for i in range(0, len(pending), self.chunk_size)]
+            backend = Crypto._VerificationBackend
+            work = [[compact[index] for index in chunk] for chunk in chunks]
+            for chunk, chunk_results in zip(chunks, self._get_pool().map(_verify_chunk, [backend] * len(chunks), work)):
+                for index, result in zip(chunk, chunk_results):
+                    results[index] = result
+                    if result and cache_keys[index] is not None:
+                        cache.put(cache_keys[index], True)
+                while next_index < len(results) and results[next_index] is not None:
+                    yield results[next_index]
+                    next_index += 1
+
+        for result in results[next_index:]:
+            yield result
+
+    def shutdown(self, wait=True):
+        """
+        Stop the worker processes. The pool is started again by the next batch.
+
+        Args:
+            wait (bool): whether to wait for the running chunks to finish.
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    @staticmethod
+    def _compact(message, signature, public_key, unhex):
+        """
+        Reduce an item to the raw bytes sent to a worker: the SHA-256 digest of the message
+        instead of the message, and ECPoint public keys as their 64 byte x and y coordinates,
+        which the worker decodes without a square root.
+        """
+        # an empty signature fails in the worker like `VerifySignature` does
+        unusable = (b'\x00' * 32, b'', b'')
+
+        digest = Crypto._MessageDigest(message, unhex)
+        if digest is None:
+            return unusable
+        try:
+            if isinstance(public_key, EllipticCurve.ECPoint):
+                # the point at infinity encodes to b'\x00', leaving an empty key that fails to decode
+                public_key = public_key.encode_point_raw(False)[1:]
+            return (digest, bytes(signature), bytes(public_key))
+        except Exception as e:
+            return unusable
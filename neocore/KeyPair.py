@@ -6,7 +6,7 @@ import bitcoin
 from Crypto.Cipher import AES
 from neocore.Cryptography.ECCurve import ECDSA
 from neocore.Cryptography.Crypto import Crypto
-from neocore.Cryptography.Helper import xor_bytes
+from neocore.Cryptography.Helper import xor_bytes, pubkey_bytes_to_redeem, redeem_to_scripthash, scripthash_to_address
 
 # NEP-2 constants
 # https://github.com/neo-project/proposals/blob/master/nep-2.mediawiki
@@ -28,7 +28,10 @@ class KeyPair(object):
 
     def setup_curve(self):
         """
-        Setup the Elliptic curve parameters.
+        Setup the Elliptic curve parameters of pybitcointools.
+
+        The key pair no longer uses pybitcointools, this is only needed by callers
+        using its global curve directly.
         """
         bitcoin.change_curve(
             115792089210356248762697446949407573530086143415290314195533631308867097853951,
@@ -46,8 +49,6 @@ class KeyPair(object):
         Args:
             priv_key (bytes): a private key.
         """
-        self.setup_curve()
-
         length = len(priv_key)
 
         if length != 32 and length != 96 and length != 104:
@@ -55,27 +56,24 @@ class KeyPair(object):
 
         self.PrivateKey = bytearray(priv_key[-32:])
 
-        pubkey_encoded_not_compressed = None
+        edcsa = ECDSA.secp256r1()
 
         if length == 32:
             try:
-                pubkey_encoded_not_compressed = bitcoin.privkey_to_pubkey(priv_key)
+                privkey = int.from_bytes(priv_key, 'big')
+                if not 0 < privkey < edcsa.GFn.p:
+                    raise ValueError("Invalid privkey")
+                self.PublicKey = edcsa.calcpub(privkey)
             except Exception as e:
                 raise Exception("Could not determine public key")
 
         elif length == 96 or length == 104:
             skip = length - 96
-            pubkey_encoded_not_compressed = bytearray(b'\x04') + bytearray(priv_key[skip:skip + 64])
-
-        if pubkey_encoded_not_compressed:
-            pubkey_points = bitcoin.decode_pubkey(pubkey_encoded_not_compressed, 'bin')
-
-            pubx = pubkey_points[0]
-            puby = pubkey_points[1]
-            edcsa = ECDSA.secp256r1()
+            pubx = int.from_bytes(priv_key[skip:skip + 32], 'big')
+            puby = int.from_bytes(priv_key[skip + 32:skip + 64], 'big')
             self.PublicKey = edcsa.Curve.point(pubx, puby)
 
-        self.PublicKeyHash = Crypto.ToScriptHash(self.PublicKey.encode_point(True), unhex=True)
+        self.PublicKeyHash = Crypto.ToScriptHash(self.PublicKey.encode_point_raw(True), unhex=False)
 
     @staticmethod
     def PrivateKeyFromWIF(wif):
@@ -156,6 +154,21 @@ class KeyPair(object):
 
         return private_key
 
+    @staticmethod
+    async def from_nep2_async(nep2_key, passphrase):
+        """
+        Gets the private key from a NEP-2 encrypted private key without blocking the event loop,
+        the scrypt key derivation runs on the executor configured with `Crypto.SetAsyncExecutor`.
+
+        Args:
+            nep2_key (str): The nep-2 encrypted private key
+            passphrase (str): The password to encrypt the private key with, as unicode string
+
+        Returns:
+            bytes: The private key
+        """
+        return await Crypto.run_async(KeyPair.PrivateKeyFromNEP2, nep2_key, passphrase)
+
     def GetAddress(self):
         """
         Returns the public NEO address for this KeyPair
@@ -163,10 +176,8 @@ class KeyPair(object):
         Returns:
             str: The private key
         """
-        script = b'21' + self.PublicKey.encode_point(True) + b'ac'
-        script_hash = Crypto.ToScriptHash(script)
-        address = Crypto.ToAddress(script_hash)
-        return address
+        script = pubkey_bytes_to_redeem(self.PublicKey.encode_point_raw(True))
+        return scripthash_to_address(redeem_to_scripthash(script))
 
     def Export(self):
         """
@@ -1,3 +1,4 @@
+import asyncio
 import binascii
 import base58
 from mock import patch
@@ -12,15 +13,20 @@ class ConstructorTestCase(TestCase):
             KeyPair(priv_key)
         self.assertEqual('Invalid private key', str(context.exception))
 
-    @patch('neocore.KeyPair.bitcoin.privkey_to_pubkey')
-    def test_fail_to_determine_plublic_key(self, patched_priv_to_pubkey):
-        # https://github.com/vbuterin/pybitcointools/blob/aeb0a2bbb8bbfe421432d776c649650eaeb882a5/bitcoin/main.py#L291
-        patched_priv_to_pubkey.side_effect = Exception("Invalid privkey")
+    @patch('neocore.KeyPair.ECDSA.calcpub')
+    def test_fail_to_determine_plublic_key(self, patched_calcpub):
+        patched_calcpub.side_effect = Exception("Invalid privkey")
 
         with self.assertRaises(Exception) as context:
             KeyPair(bytes(32 * 'A', 'utf8'))
         self.assertEqual('Could not determine public key', str(context.exception))
 
+    def test_private_key_out_of_range(self):
+        for priv_key in (b'\x00' * 32, b'\xff' * 32):
+            with self.assertRaises(Exception) as context:
+                KeyPair(priv_key)
+            self.assertEqual('Could not determine public key', str(context.exception))
+
     def test_long_private_key(self):
         # Taken from the neo-python UserWallet test
         priv_key = b'[\\\x8c\xdc\xb3/\x8e\'\x8e\x11\x1a\x0b\xf5\x8e\xbbF9\x88\x02K\xb4\xe2P\xaaC\x10\xb4\x02R\x03\x0b`\xdd\xc4\x99[\xac\x00)\x8b"s\x1d\xe7\xa8?\xa4\x9d\xed*\xce\xeai\xfa=\xd8r\x93p \xc8\xa9\xb6\xc6ad\xf6V\x9b#\xdfX\xc5Ltnv\x84%\x1a\x17e:K2\xf1\xb4JW\x03\xfd\xad\x94\x8eu]'
@@ -87,6 +93,18 @@ class PrivateKeyFromNEP2TestCase(TestCase):
         privkey_hex = binascii.hexlify(privkey)
         self.assertEqual(privkey_hex, should_equal_private_key)
 
+    def test_should_work_async(self):
+        nep2_key = "6PYVPVe1fQznphjbUxXP9KZJqPMVnVwCx5s5pr5axRJ8uHkMtZg97eT5kL"
+        loop = asyncio.new_event_loop()
+        try:
+            privkey = loop.run_until_complete(KeyPair.from_nep2_async(nep2_key, "TestingOneTwoThree"))
+            self.assertEqual(b"cbf4b9f70470856bb4f40f80b87edb90865997ffee6df315ab166d713af433a5", binascii.hexlify(privkey))
+
+            with self.assertRaises(ValueError):
+                loop.run_until_complete(KeyPair.from_nep2_async(nep2_key, "invalid-pwd"))
+        finally:
+            loop.close()
+
     def test_should_throw_error_on_invalid_password(self):
         nep2_key = "6PYVPVe1fQznphjbUxXP9KZJqPMVnVwCx5s5pr5axRJ8uHkMtZg97eT5kL"
         pwd = "invalid-pwd"
@@ -1,11 +1,23 @@
+import asyncio
+import base58
 import binascii
+import copy
+import hashlib
+import pickle
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from mock import patch
 from neocore.Cryptography import Helper
 from unittest import TestCase
 from neocore.KeyPair import KeyPair
 from neocore.Cryptography.MerkleTree import MerkleTree
+from neocore.Cryptography.LRUCache import LRUCache
+from neocore.Cryptography.Signer import Signer
+from neocore.Cryptography.VerificationExecutor import VerificationExecutor
 from neocore.UInt256 import UInt256
-from neocore.Cryptography.Crypto import Crypto
+from neocore.Cryptography.Crypto import Crypto, VERIFICATION_BACKEND_NATIVE, VERIFICATION_BACKEND_ECDSA
+from neocore.Cryptography.ECCurve import ECDSA, EllipticCurve, FiniteField, SECP256R1_A, SECP256R1_B, SECP256R1_P
 
 
 class HelperTestCase(TestCase):
@@ -27,6 +39,10 @@ class HelperTestCase(TestCase):
         res = Helper.base256_encode(val)
         self.assertEqual(res, bytearray(b'\xd2\x02\x96I'))
 
+    def test_base58_encode(self):
+        for data in (b'', b'\x00', b'\x00\x00\x01', b'\x39', b'\xff' * 25, bytes(range(25)), b'\x00' + bytes(range(1, 40))):
+            self.assertEqual(base58.b58encode(data).decode('utf-8'), Helper.base58_encode(data))
+
     def test_random_key(self):
         a = Helper.random_key()
         self.assertEqual(len(a), 64)
@@ -56,6 +72,11 @@ class HelperTestCase(TestCase):
         self.assertEqual(scripthash, expected_scripthash)
         self.assertEqual(address, expected_address)
 
+        redeemscript = Helper.pubkey_bytes_to_redeem(kp.PublicKey.encode_point_raw(True))
+        self.assertEqual(redeemscript, expected_redeemscript)
+        self.assertEqual(expected_scripthash, Crypto.ToScriptHash(redeemscript, unhex=False).Data)
+        self.assertEqual(expected_address, kp.GetAddress())
+
     def test_scripthash_to_address_with_alternative_version(self):
         default_address_version = Helper.ADDRESS_VERSION
         Helper.ADDRESS_VERSION = 42
@@ -208,6 +229,190 @@ class MerkleTreeTestCase(TestCase):
         m.Root.LeftChild.Size()
 
 
+class VerificationExecutorTestCase(TestCase):
+    def setUp(self):
+        keypair = KeyPair(b'\x01' * 32)
+        self.items = []
+        for i in range(8):
+            message = binascii.hexlify(bytes([i]) * 4)
+            signature = Crypto.Sign(message, bytes(keypair.PrivateKey))
+            self.items.append((message, signature, keypair.PublicKey))
+        self.items[3] = (b'aabb', self.items[3][1], keypair.PublicKey)
+        self.items[6] = (b'zz', self.items[6][1], keypair.PublicKey)
+        self.expected = [i not in (3, 6) for i in range(len(self.items))]
+
+    def test_process_pool(self):
+        with VerificationExecutor(workers=2, chunk_size=3, serial_threshold=0) as executor:
+            self.assertEqual(self.expected, executor.verify(self.items))
+            self.assertEqual(self.expected, list(executor.imap(iter(self.items))))
+
+            # an unusable key fails its own item only
+            items = list(self.items)
+            items[1] = (items[1][0], items[1][1], ECDSA.secp256r1().ec.Infinity)
+            items[4] = (items[4][0], items[4][1], None)
+            expected = list(self.expected)
+            expected[1] = expected[4] = False
+            self.assertEqual(expected, executor.verify(items))
+
+    def test_verification_cache(self):
+        Crypto.ClearVerificationCache()
+        Crypto.SetVerificationCacheSize(100)
+        try:
+            with VerificationExecutor(workers=2, chunk_size=3, serial_threshold=0) as executor:
+                self.assertEqual(self.expected, executor.verify(self.items))
+                stats = Crypto.VerificationCacheStats()
+                self.assertEqual(0, stats['hits'])
+                self.assertEqual(6, stats['size'])
+
+                self.assertEqual(self.expected, executor.verify(self.items))
+                self.assertEqual(6, Crypto.VerificationCacheStats()['hits'])
+
+            # a batch answered by the cache does not start the workers
+            valid = [item for item, expected in zip(self.items, self.expected) if expected]
+            executor = VerificationExecutor(workers=2, chunk_size=3, serial_threshold=0)
+            self.assertEqual([True] * len(valid), executor.verify(valid))
+            self.assertIsNone(executor._pool)
+        finally:
+            Crypto.SetVerificationCacheSize(0)
+            Crypto.ClearVerificationCache()
+
+    def test_serial_fallback(self):
+        executor = VerificationExecutor(workers=2, chunk_size=8)
+        self.assertEqual(self.expected, executor.verify(self.items))
+        self.assertIsNone(executor._pool)
+
+        with self.assertRaises(ValueError):
+            VerificationExecutor(workers=0)
+
+
+class AsyncTestCase(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+        Crypto.SetAsyncExecutor()
+
+    def test_verify_async(self):
+        keypair = KeyPair(b'\x01' * 32)
+        signature = Crypto.Sign(b'aabb', bytes(keypair.PrivateKey))
+
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            Crypto.SetAsyncExecutor(executor, max_concurrency=2)
+            results = self.loop.run_until_complete(asyncio.gather(
+                Crypto.verify_async(b'aabb', signature, keypair.PublicKey),
+                Crypto.verify_async(b'aabbcc', signature, keypair.PublicKey)))
+        self.assertEqual([True, False], results)
+
+        Crypto.SetAsyncExecutor()
+        self.assertEqual(Crypto.Hash256(b'abc'), self.loop.run_until_complete(Crypto.hash256_async(b'abc')))
+        self.assertEqual(Crypto.Hash160Bytes(b'abc'), self.loop.run_until_complete(Crypto.hash160_async(b'abc')))
+
+    def test_concurrency_limit(self):
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def work(i):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return i
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            Crypto.SetAsyncExecutor(executor, max_concurrency=2)
+            results = self.loop.run_until_complete(asyncio.gather(*[Crypto.run_async(work, i) for i in range(8)]))
+        self.assertEqual(list(range(8)), results)
+        self.assertEqual(2, running[1])
+
+        with self.assertRaises(ValueError):
+            Crypto.SetAsyncExecutor(max_concurrency=0)
+
+
+class SignerTestCase(TestCase):
+    def test_matches_crypto_sign(self):
+        keypair = KeyPair(binascii.unhexlify("cbf4b9f70470856bb4f40f80b87edb90865997ffee6df315ab166d713af433a5"))
+        signer = Signer(keypair)
+        messages = [bytes([i]) * i for i in range(6)]
+        expected = [Crypto.Sign(binascii.hexlify(message), bytes(keypair.PrivateKey)) for message in messages]
+
+        self.assertEqual(keypair.PublicKey, signer.PublicKey)
+        self.assertEqual(expected[3], signer.sign(messages[3]))
+        self.assertEqual(expected, signer.sign_many(messages))
+        self.assertEqual(expected, signer.sign_many(iter(messages)))
+        self.assertEqual([], signer.sign_many([]))
+        self.assertTrue(Crypto.VerifySignature(messages[5], expected[5], keypair.PublicKey, unhex=False))
+
+
+class LRUCacheTestCase(TestCase):
+    def test_get_and_put(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+
+        self.assertEqual(1, cache.get('a'))
+        self.assertIsNone(cache.get('c'))
+        self.assertEqual({'hits': 1, 'misses': 1, 'size': 2, 'max_size': 2}, cache.stats())
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+        self.assertEqual([1, 3], cache.values())
+
+    def test_resize_and_clear(self):
+        cache = LRUCache(3)
+        for i in range(3):
+            cache.put(i, i)
+        cache.resize(1)
+        self.assertEqual(1, len(cache))
+        self.assertIn(2, cache)
+
+        cache.clear()
+        self.assertEqual(0, len(cache))
+        self.assertEqual(0, cache.stats()['hits'])
+
+        cache.resize(0)
+        cache.put('a', 1)
+        self.assertEqual(0, len(cache))
+
+        with self.assertRaises(ValueError):
+            LRUCache(-1)
+
+    def test_pickle(self):
+        cache = LRUCache(3)
+        cache.put('a', 1)
+
+        restored = pickle.loads(pickle.dumps(cache))
+        self.assertEqual(3, restored.max_size)
+        self.assertEqual(0, len(restored))
+        restored.put('b', 2)
+        self.assertEqual(2, restored.get('b'))
+
+    def test_pickle_public_key(self):
+        keypair = KeyPair(bytes(range(1, 33)))
+        ECDSA.secp256r1().key_table(keypair.PublicKey)
+
+        self.assertEqual(keypair.PublicKey, pickle.loads(pickle.dumps(keypair.PublicKey)))
+        self.assertEqual(keypair.PublicKey, copy.deepcopy(keypair.PublicKey))
+        self.assertEqual(keypair.GetAddress(), copy.deepcopy(keypair).GetAddress())
+
+        curve = pickle.loads(pickle.dumps(ECDSA.secp256r1()))
+        digest = hashlib.sha256(b'abc').digest()
+        r, s = curve.sign_deterministic(digest, 1)
+        self.assertTrue(curve.verify(curve._digest_int(digest), curve.G, r, s))
+
+
 class TestCrypto(TestCase):
     def test_sign_and_verify(self):
         privkey = KeyPair.PrivateKeyFromWIF("L44B5gGEpqEDRS9vVPz7QT35jcBG2r3CZwSwQ4fCewXAhAhqGVpP")
@@ -235,6 +440,185 @@ class TestCrypto(TestCase):
         verification_result = Crypto.VerifySignature(b'aabb', keypair_signature, keypair.PublicKey)
         self.assertFalse(verification_result)
 
+    def test_verification_backends(self):
+        privkey = KeyPair.PrivateKeyFromWIF("L44B5gGEpqEDRS9vVPz7QT35jcBG2r3CZwSwQ4fCewXAhAhqGVpP")
+        keypair = KeyPair(privkey)
+        hashdata = b'aabbcc'
+        signature = Crypto.Sign(hashdata, bytes(keypair.PrivateKey))
+        compressed = binascii.unhexlify(keypair.PublicKey.encode_point(True))
+        uncompressed = binascii.unhexlify(keypair.PublicKey.encode_point(False))
+
+        try:
+            for backend in (VERIFICATION_BACKEND_NATIVE, VERIFICATION_BACKEND_ECDSA):
+                Crypto.SetVerificationBackend(backend)
+                for public_key in (keypair.PublicKey, compressed, uncompressed[1:]):
+                    self.assertTrue(Crypto.VerifySignature(hashdata, signature, public_key), backend)
+                    self.assertFalse(Crypto.VerifySignature(b'aabb', signature, public_key), backend)
+                self.assertFalse(Crypto.VerifySignature(hashdata, signature[:63], compressed), backend)
+                self.assertFalse(Crypto.VerifySignature(hashdata, signature, b'\x02' + b'\x00' * 32), backend)
+        finally:
+            Crypto.SetVerificationBackend(VERIFICATION_BACKEND_NATIVE)
+
+        # the native backend also accepts uncompressed keys with their prefix
+        self.assertTrue(Crypto.VerifySignature(hashdata, signature, uncompressed))
+
+        with self.assertRaises(ValueError):
+            Crypto.SetVerificationBackend('unknown')
+
+    def test_sign_and_verify_digest(self):
+        keypair = KeyPair(b'\x01' * 32)
+        message = b'\xaa\xbb\xcc'
+        digest = hashlib.sha256(message).digest()
+
+        signature = Crypto.sign_digest(digest, bytes(keypair.PrivateKey))
+        self.assertEqual(Crypto.Sign(binascii.hexlify(message), bytes(keypair.PrivateKey)), signature)
+        self.assertEqual(signature, Crypto.sign_digest(digest, binascii.hexlify(keypair.PrivateKey)))
+
+        try:
+            for backend in (VERIFICATION_BACKEND_NATIVE, VERIFICATION_BACKEND_ECDSA):
+                Crypto.SetVerificationBackend(backend)
+                self.assertTrue(Crypto.verify_digest(digest, signature, keypair.PublicKey), backend)
+                self.assertTrue(Crypto.VerifySignature(message, signature, keypair.PublicKey, unhex=False), backend)
+                self.assertFalse(Crypto.verify_digest(hashlib.sha256(b'').digest(), signature, keypair.PublicKey), backend)
+                self.assertEqual([True, False], Crypto.verify_digests(iter([
+                    (digest, signature, keypair.PublicKey), (hashlib.sha256(b'').digest(), signature, keypair.PublicKey)])), backend)
+        finally:
+            Crypto.SetVerificationBackend(VERIFICATION_BACKEND_NATIVE)
+
+        with self.assertRaises(ValueError):
+            Crypto.sign_digest(digest[:31], bytes(keypair.PrivateKey))
+        with self.assertRaises(ValueError):
+            Crypto.verify_digest(message, signature, keypair.PublicKey)
+
+    def test_verifying_key_cache(self):
+        keypair = KeyPair(b'\x01' * 32)
+        signature = Crypto.Sign(b'aabb', bytes(keypair.PrivateKey))
+
+        try:
+            Crypto.SetVerificationBackend(VERIFICATION_BACKEND_ECDSA)
+            Crypto.ClearVerifyingKeyCache()
+            for i in range(3):
+                self.assertTrue(Crypto.VerifySignature(b'aabb', signature, keypair.PublicKey))
+            self.assertFalse(Crypto.VerifySignature(b'aabbcc', signature, keypair.PublicKey))
+            self.assertEqual({'hits': 3, 'misses': 1, 'size': 1, 'max_size': 256}, Crypto.VerifyingKeyCacheStats())
+
+            # invalid keys are not cached
+            self.assertFalse(Crypto.VerifySignature(b'aabb', signature, b'\x00' * 64))
+            self.assertEqual(1, Crypto.VerifyingKeyCacheStats()['size'])
+
+            Crypto.ClearVerifyingKeyCache()
+            self.assertEqual(0, Crypto.VerifyingKeyCacheStats()['size'])
+        finally:
+            Crypto.SetVerificationBackend(VERIFICATION_BACKEND_NATIVE)
+
+    def test_verification_cache(self):
+        keypair = KeyPair(b'\x01' * 32)
+        signature = Crypto.Sign(b'aabb', bytes(keypair.PrivateKey))
+        public_key = binascii.unhexlify(keypair.PublicKey.encode_point(False))[1:]
+
+        self.assertEqual(0, Crypto.VerificationCacheStats()['max_size'])
+        try:
+            Crypto.SetVerificationCacheSize()
+            self.assertTrue(Crypto.VerifySignature(b'aabb', signature, keypair.PublicKey))
+            self.assertTrue(Crypto.VerifySignature(b'aabb', signature, keypair.PublicKey))
+            self.assertFalse(Crypto.VerifySignature(b'aabbcc', signature, keypair.PublicKey))
+            self.assertFalse(Crypto.VerifySignature(b'aabbcc', signature, keypair.PublicKey))
+            self.assertEqual(1, Crypto.VerificationCacheStats()['size'])
+            self.assertEqual(1, Crypto.VerificationCacheStats()['hits'])
+
+            # moving bytes from the signature to the public key must not hit the cache
+            self.assertTrue(Crypto.VerifySignature(b'aabb', signature, public_key))
+            self.assertFalse(Crypto.VerifySignature(b'aabb', signature + public_key[:1], public_key[1:]))
+
+            self.assertEqual([True, False], Crypto.VerifySignatures([
+                (b'aabb', signature, keypair.PublicKey), (b'aabbcc', signature, keypair.PublicKey)]))
+            self.assertEqual(3, Crypto.VerificationCacheStats()['hits'])
+
+            Crypto.ClearVerificationCache()
+            self.assertEqual(0, Crypto.VerificationCacheStats()['size'])
+        finally:
+            Crypto.SetVerificationCacheSize(0)
+
+    def test_infinity_public_key_is_rejected(self):
+        # with Y = infinity, r = x(k*G) and s = m/k satisfy G*(m/s) + Y*(r/s) = k*G
+        curve = ECDSA.secp256r1()
+        n = curve.GFn.p
+        k = 12345
+        message = b'aabb'
+        m = int.from_bytes(hashlib.sha256(binascii.unhexlify(message)).digest(), 'big')
+        r = curve.mul_generator(k).x.value % n
+        # 1/s = k/m, so G*(m/s) = G*k
+        s = m * pow(k, n - 2, n) % n
+        signature = r.to_bytes(32, 'big') + s.to_bytes(32, 'big')
+
+        infinity = curve.ec.Infinity
+        self.assertFalse(curve.verify(m, infinity, r, s))
+        self.assertEqual([False], curve.verify_batch([(m, infinity, r, s)]))
+        try:
+            for backend in (VERIFICATION_BACKEND_NATIVE, VERIFICATION_BACKEND_ECDSA):
+                Crypto.SetVerificationBackend(backend)
+                self.assertFalse(Crypto.VerifySignature(message, signature, infinity), backend)
+                self.assertFalse(Crypto.VerifySignature(message, signature, ECDSA.decode_secp256r1('00').G), backend)
+                self.assertEqual([False], Crypto.VerifySignatures([(message, signature, infinity)]), backend)
+        finally:
+            Crypto.SetVerificationBackend(VERIFICATION_BACKEND_NATIVE)
+
+    def test_public_key_of_equal_curve(self):
+        keypair = KeyPair(bytes([7]) * 32)
+        message = b'aabbcc'
+        signature = Crypto.Sign(message, bytes(keypair.PrivateKey))
+        ec = EllipticCurve(FiniteField(SECP256R1_P), SECP256R1_A, SECP256R1_B)
+        pubkey = ec.point(keypair.PublicKey.x.value, keypair.PublicKey.y.value)
+        try:
+            for backend in (VERIFICATION_BACKEND_NATIVE, VERIFICATION_BACKEND_ECDSA):
+                Crypto.SetVerificationBackend(backend)
+                self.assertTrue(Crypto.VerifySignature(message, signature, pubkey), backend)
+        finally:
+            Crypto.SetVerificationBackend(VERIFICATION_BACKEND_NATIVE)
+
+    def test_verify_signatures(self):
+        keypairs = [KeyPair(bytes([i]) * 32) for i in range(1, 5)]
+        items = []
+        for i in range(14):
+            keypair = keypairs[i % len(keypairs)]
+            message = binascii.hexlify(bytes([i]) * 10)
+            signature = Crypto.Sign(message, bytes(keypair.PrivateKey))
+            items.append((message, signature, keypair.PublicKey))
+
+        self.assertEqual([True] * len(items), Crypto.VerifySignatures(items))
+
+        # wrong message, wrong key, short signature, invalid key
+        items[2] = (b'aabb', items[2][1], items[2][2])
+        items[7] = (items[7][0], items[7][1], keypairs[0].PublicKey)
+        items[9] = (items[9][0], items[9][1][:63], items[9][2])
+        items[12] = (items[12][0], items[12][1], b'\x02' + b'\x00' * 32)
+        expected = [Crypto.VerifySignature(*item) for item in items]
+        self.assertEqual([i not in (2, 7, 9, 12) for i in range(len(items))], expected)
+        self.assertEqual(expected, Crypto.VerifySignatures(items))
+        self.assertEqual(expected, Crypto.VerifySignatures(iter(items)))
+        self.assertEqual(expected, Crypto.VerifySignatures(item for item in items))
+        self.assertEqual([], Crypto.VerifySignatures([]))
+
+        try:
+            Crypto.SetVerificationBackend(VERIFICATION_BACKEND_ECDSA)
+            self.assertEqual(expected, Crypto.VerifySignatures(items))
+        finally:
+            Crypto.SetVerificationBackend(VERIFICATION_BACKEND_NATIVE)
+
+    def test_hash_many(self):
+        buffers = [bytes([i]) * (i * 7) for i in range(20)]
+        expected256 = [Crypto.Hash256(buffer) for buffer in buffers]
+        expected160 = [Crypto.Hash160Bytes(buffer) for buffer in buffers]
+
+        self.assertEqual(expected256, Crypto.Hash256Many(buffers))
+        self.assertEqual(expected160, Crypto.Hash160Many(iter(buffers)))
+        self.assertEqual([], Crypto.Hash256Many([]))
+
+        # force the large buffers through the thread pool
+        with patch('neocore.Cryptography.Crypto.HASH_PARALLEL_THRESHOLD', 50), patch('neocore.Cryptography.Crypto.HASH_THREAD_POOL_SIZE', 3):
+            self.assertEqual(expected256, Crypto.Hash256Many(buffers))
+            self.assertEqual(expected160, Crypto.Hash160Many(buffers))
+
     def test_script_hash(self):
         # Expected output taken from running: getHash(Buffer.from('abc', 'utf8')).toString('hex')
         # using https://github.com/CityOfZion/neon-wallet-react-native/blob/master/app/api/crypto/index.js
@@ -0,0 +1,457 @@
+import io
+import hashlib
+import binascii
+from unittest import TestCase
+from neocore.Cryptography import ECCurve
+from neocore.Cryptography.ECCurve import ECDSA, FiniteField, wnaf
+from neocore.IO.BinaryReader import BinaryReader
+
+
+class FiniteFieldTestCase(TestCase):
+    def test_batch_inverse(self):
+        field = FiniteField(0xFFFFFFFF00000001000000000000000000000000FFFFFFFFFFFFFFFFFFFFFFFF)
+        values = [3, field.value(5), 0, 0xcbf4b9f70470856bb4f40f80b87edb90865997ffee6df315ab166d713af433a5]
+
+        inverses = field.batch_inverse(values)
+
+        self.assertEqual(0, inverses[2])
+        for value, inverse in zip(values, inverses):
+            if inverse:
+                self.assertEqual(1, field.integer(value) * inverse % field.p)
+        self.assertEqual([], field.batch_inverse([]))
+
+    def test_modinv_backends(self):
+        p = 0xFFFFFFFF00000001000000000000000000000000FFFFFFFFFFFFFFFFFFFFFFFF
+        x = 0xcbf4b9f70470856bb4f40f80b87edb90865997ffee6df315ab166d713af433a5
+
+        for name, backend in ECCurve.MODINV_BACKENDS.items():
+            self.assertEqual(1, backend(x, p) * x % p, name)
+            self.assertEqual(0, backend(0, p), name)
+
+    def test_set_modinv_backend(self):
+        default = ECCurve.modinv
+        try:
+            ECCurve.set_modinv_backend('recursive')
+            self.assertIs(ECCurve.MODINV_BACKENDS['recursive'], ECCurve.modinv)
+            self.assertTrue(ECDSA.secp256r1().calcpub(1234).isoncurve())
+
+            with self.assertRaises(ValueError):
+                ECCurve.set_modinv_backend('unknown')
+        finally:
+            ECCurve.modinv = default
+
+    def test_modsqrt(self):
+        # one prime for every branch of the square root dispatch: 3 mod 4, 5 mod 8 and 1 mod 8
+        for p in [0xFFFFFFFF00000001000000000000000000000000FFFFFFFFFFFFFFFFFFFFFFFF, 2 ** 255 - 19, 2 ** 224 - 2 ** 96 + 1]:
+            field = FiniteField(p)
+            for x in [4, 0xcbf4b9f70470856bb4f40f80b87edb90865997ffee6df315ab166d713af433a5]:
+                square = x * x % p
+                root = field.modsqrt(square)
+                self.assertEqual(square, root * root % p)
+
+                res = field.sqrt(field.value(square), 1)
+                self.assertEqual(1, res.value % 2)
+                self.assertEqual(square, (res * res).value)
+
+        # 3 is not a quadratic residue modulus 7
+        field = FiniteField(7)
+        self.assertIsNone(field.modsqrt(3))
+        with self.assertRaises(ValueError):
+            field.sqrt(field.value(3), 0)
+
+    def test_value_operators(self):
+        field = FiniteField(23)
+        a = field.value(5)
+        b = field.value(7)
+
+        self.assertEqual(12, (a + b).value)
+        self.assertEqual(21, (a - b).value)
+        self.assertEqual(12, (a * b).value)
+        self.assertEqual(a, (a / b) * b)
+        self.assertEqual(1, ((1 / a) * a).value)
+        self.assertEqual(18, (-a).value)
+        self.assertEqual(0, (-field.zero()).value)
+        self.assertEqual(2, (10 - a * 5 + 17).value)
+        self.assertTrue(a == 28)
+        self.assertFalse(hasattr(a, '__dict__'))
+
+
+class EllipticCurveTestCase(TestCase):
+    def setUp(self):
+        self.ecdsa = ECDSA.secp256r1()
+        self.G = self.ecdsa.G
+
+    def test_calcpub(self):
+        # NEP 2 testvector
+        privkey = 0xcbf4b9f70470856bb4f40f80b87edb90865997ffee6df315ab166d713af433a5
+        pubkey = self.ecdsa.calcpub(privkey)
+
+        self.assertTrue(pubkey.isoncurve())
+        self.assertEqual(b'026241e7e26b38bb7154b8ad49458b97fb1c4797443dc921c5ca5774f511a2bbfc', pubkey.encode_point(True))
+
+    def test_encode_point_raw(self):
+        for k in (1, 2, 3, 0xcbf4b9f70470856bb4f40f80b87edb90865997ffee6df315ab166d713af433a5):
+            pubkey = self.ecdsa.calcpub(k)
+            for compressed in (True, False):
+                self.assertEqual(binascii.unhexlify(pubkey.encode_point(compressed)), pubkey.encode_point_raw(compressed))
+
+        self.assertEqual(b'\x00', self.ecdsa.ec.zero().encode_point_raw())
+
+    def test_add_and_double(self):
+        G = self.G
+        self.assertEqual(G + G, G * 2)
+        self.assertEqual(G * 2 + G, G * 3)
+        self.assertEqual(G * 3 - G, G * 2)
+        self.assertTrue((G * 3).isoncurve())
+
+    def test_infinity(self):
+        G = self.G
+        infinity = self.ecdsa.Curve.Infinity
+
+        self.assertTrue((G - G).IsInfinity)
+        self.assertEqual(G * 0, infinity)
+        self.assertEqual(G + infinity, G)
+        self.assertEqual(infinity + G, G)
+        self.assertEqual(bytearray([0]), (G - G).encode_point())
+
+    def test_multi_scalar_mul(self):
+        curve = self.ecdsa.Curve
+        points = [self.G * (i + 1) for i in range(40)] + [curve.Infinity]
+        scalars = [(i + 1) * 0xcbf4b9f70470856bb4f40f80b87edb90865997ffee6df315ab166d713af433a5 for i in range(40)] + [5]
+        scalars[3] = -scalars[3]
+        scalars[7] = 0
+
+        expected = curve.zero()
+        for point, scalar in zip(points, scalars):
+            expected += point * scalar
+
+        # Pippenger above the threshold, Straus below
+        self.assertEqual(expected, curve.multi_scalar_mul(points, scalars))
+        self.assertEqual(sum(((p * k) for p, k in zip(points[:5], scalars[:5])), curve.zero()),
+                         curve.multi_scalar_mul(points[:5], scalars[:5]))
+
+        self.assertTrue(curve.multi_scalar_mul([], []).IsInfinity)
+        with self.assertRaises(ValueError):
+            curve.multi_scalar_mul(points, scalars[:2])
+
+    def test_wnaf(self):
+        for k in [1, 7, 0xcbf4b9f70470856bb4f40f80b87edb90865997ffee6df315ab166d713af433a5]:
+            digits = wnaf(k, 4)
+            self.assertEqual(k, sum(d << i for i, d in enumerate(digits)))
+            for i, d in enumerate(digits):
+                if d:
+                    self.assertTrue(d % 2 == 1 and -8 < d < 8)
+                    self.assertFalse(any(digits[i + 1:i + 4]))
+
+    def test_mul(self):
+        G = self.G
+        self.assertEqual(G * 13, G + G + G + G + G + G + G + G + G + G + G + G + G)
+        self.assertEqual(G * -13, -(G * 13))
+
+        k = 0xcbf4b9f70470856bb4f40f80b87edb90865997ffee6df315ab166d713af433a5
+        self.assertEqual((G * 7) * k, G * (7 * k))
+
+    def test_multiply_two(self):
+        G = self.G
+        Q = G * 7
+        a = 0xcbf4b9f70470856bb4f40f80b87edb90865997ffee6df315ab166d713af433a5
+        b = 0x0123456789abcdef
+
+        self.assertEqual(G * a + Q * b, self.ecdsa.Curve.multiply_two(G, a, Q, b))
+        self.assertEqual(G * 3, self.ecdsa.Curve.multiply_two(G, 5, Q, -2) + G * 12)
+        self.assertTrue(self.ecdsa.Curve.multiply_two(G, 0, Q, 0).IsInfinity)
+
+    def test_encode_points(self):
+        points = [self.G * k for k in range(1, 6)] + [self.ecdsa.Curve.Infinity]
+        expected = [(self.G * k).encode_point(True) for k in range(1, 6)] + [bytearray([0])]
+
+        self.assertEqual(expected, self.ecdsa.Curve.encode_points(points))
+
+    def test_affine_coordinates(self):
+        G3 = self.G * 3
+        same = self.ecdsa.Curve.point(G3.x.value, G3.y.value)
+
+        self.assertEqual(G3, same)
+        self.assertEqual(G3.encode_point(False), same.encode_point(False))
+        self.assertNotEqual(G3, -G3)
+        self.assertEqual(G3.x, (-G3).x)
+
+    def test_findpk(self):
+        privkey = 0xcbf4b9f70470856bb4f40f80b87edb90865997ffee6df315ab166d713af433a5
+        pubkey = self.ecdsa.calcpub(privkey)
+        r, s = self.ecdsa.sign(12345, privkey, 987654321)
+
+        candidates = [self.ecdsa.findpk(12345, r, s, flag) for flag in (0, 1)]
+        self.assertIn(pubkey, candidates)
+
+    def test_decompress_invalid_x(self):
+        # x = 1 is not the x coordinate of a point on secp256r1
+        with self.assertRaises(ValueError):
+            self.ecdsa.Curve.decompress_from_curve(1, 0)
+
+
+class GeneratorTableTestCase(TestCase):
+    def setUp(self):
+        self.ecdsa = ECDSA.secp256r1()
+
+    def test_mul_generator_matches_generic_mul(self):
+        for k in [1, 2, 15, 16, 0xcbf4b9f70470856bb4f40f80b87edb90865997ffee6df315ab166d713af433a5, self.ecdsa.GFn.p - 1]:
+            self.assertEqual(self.ecdsa.G * k, self.ecdsa.mul_generator(k))
+
+        self.assertTrue(self.ecdsa.mul_generator(self.ecdsa.GFn.p).IsInfinity)
+
+    def test_table_is_reused(self):
+        table = self.ecdsa.generator_table()
+        self.ecdsa.calcpub(1234)
+        self.assertIs(table, self.ecdsa.generator_table())
+
+    def test_sign_and_verify(self):
+        privkey = 0xcbf4b9f70470856bb4f40f80b87edb90865997ffee6df315ab166d713af433a5
+        pubkey = self.ecdsa.calcpub(privkey)
+        r, s = self.ecdsa.sign(12345, privkey, 987654321)
+
+        self.assertTrue(self.ecdsa.verify(12345, pubkey, r, s))
+        self.assertFalse(self.ecdsa.verify(12346, pubkey, r, s))
+
+    def test_verify_rejects_out_of_range_signature(self):
+        privkey = 0xcbf4b9f70470856bb4f40f80b87edb90865997ffee6df315ab166d713af433a5
+        pubkey = self.ecdsa.calcpub(privkey)
+        r, s = self.ecdsa.sign(12345, privkey, 987654321)
+
+        self.assertFalse(self.ecdsa.verify(12345, pubkey, 0, s))
+        self.assertFalse(self.ecdsa.verify(12345, pubkey, r, 0))
+
+    def test_rfc6979_vector(self):
+        # RFC 6979 A.2.5, P-256 with SHA-256, message "sample"
+        privkey = 0xC9AFA9D845BA75166B5C215767B1D6934E50C3DB36E89B127B8A622B120F6721
+        digest = hashlib.sha256(b'sample').digest()
+        n = self.ecdsa.GFn.p
+
+        k = next(self.ecdsa.deterministic_secrets(digest, privkey))
+        self.assertEqual(0xA6E3C57DD01ABE90086538398355DD4C3B17AA873382B0F24D6129493D8AAD60, k)
+
+        r, s = self.ecdsa.sign_deterministic(digest, privkey)
+        self.assertEqual(0xEFD48B2AACB6A8FD1140DD9CD45E81D69D2C877B56AAF991C34D0EA84EAF3716, r)
+        # the RFC signature has a high s, it is normalized to n - s
+        self.assertEqual(n - 0xF7CB1C942D657C41D436C7A1B6E29F65F3E900DBB9AFF4064DC4AB2F843ACDA8, s)
+        self.assertTrue(self.ecdsa.verify(int.from_bytes(digest, 'big'), self.ecdsa.calcpub(privkey), r, s))
+
+        with self.assertRaises(ValueError):
+            self.ecdsa.sign_deterministic(digest, 0)
+
+    def test_sign_secp256r1(self):
+        privkey = 0xC9AFA9D845BA75166B5C215767B1D6934E50C3DB36E89B127B8A622B120F6721
+        pubkey = self.ecdsa.calcpub(privkey)
+        message = int.from_bytes(hashlib.sha256(b'sample').digest(), 'big')
+
+        r, s = ECDSA.SignSecp256R1(message, privkey, pubkey)
+        self.assertEqual(0xEFD48B2AACB6A8FD1140DD9CD45E81D69D2C877B56AAF991C34D0EA84EAF3716, r.value)
+        self.assertTrue(self.ecdsa.verify(message, pubkey, r, s))
+        self.assertFalse(self.ecdsa.verify(message, self.ecdsa.calcpub(privkey + 1), r, s))
+
+        # longer messages keep their leftmost 256 bits
+        r, s = ECDSA.SignSecp256R1(message << 8 | 0xff, privkey, pubkey)
+        self.assertTrue(self.ecdsa.verify(message, pubkey, r, s))
+
+    def test_decode_public_key_rejects_invalid_points(self):
+        pubkey = self.ecdsa.calcpub(12345)
+        self.assertIs(pubkey, self.ecdsa.decode_public_key(pubkey))
+
+        off_curve = self.ecdsa.ec.point(pubkey.x.value, pubkey.y.value + 1)
+        other_curve = ECDSA.secp256k1().G
+        for point in (self.ecdsa.ec.Infinity, off_curve, other_curve):
+            with self.assertRaises(ValueError):
+                self.ecdsa.decode_public_key(point)
+
+    def test_decode_public_key_of_equal_curve(self):
+        pubkey = self.ecdsa.calcpub(12345)
+        ec = ECCurve.EllipticCurve(FiniteField(ECCurve.SECP256R1_P), ECCurve.SECP256R1_A, ECCurve.SECP256R1_B)
+
+        decoded = self.ecdsa.decode_public_key(ec.point(pubkey.x.value, pubkey.y.value))
+        self.assertIs(self.ecdsa.ec, decoded.curve)
+        self.assertEqual(pubkey, decoded)
+
+        for point in (ec.Infinity, ec.point(pubkey.x.value, pubkey.y.value + 1)):
+            with self.assertRaises(ValueError):
+                self.ecdsa.decode_public_key(point)
+
+    def test_verify_batch(self):
+        for ecdsa in (self.ecdsa, ECDSA.secp256k1()):
+            n = ecdsa.GFn.p
+            items = []
+            for i in range(1, 15):
+                r, s = ecdsa.sign(1000 + i, 7 * i, 123456789 * i)
+                items.append((1000 + i, ecdsa.calcpub(7 * i), r, s))
+            # negating s is still a valid signature, the batch check has to try both signs of R
+            items[3] = items[3][:3] + (n - items[3][3],)
+
+            self.assertEqual([True] * len(items), ecdsa.verify_batch(items))
+
+            items[1] = (0,) + items[1][1:]
+            items[8] = items[8][:3] + (0,)
+            items[13] = items[13][:1] + (items[0][1],) + items[13][2:]
+            expected = [i not in (1, 8, 13) for i in range(len(items))]
+            self.assertEqual(expected, [ecdsa.verify(*item) for item in items])
+            self.assertEqual(expected, ecdsa.verify_batch(items))
+
+
+class KeyTableTestCase(TestCase):
+    def setUp(self):
+        curve = ECDSA.secp256r1()
+        # a private instance, so the tables do not leak into the shared curve
+        self.ecdsa = ECDSA(curve.ec, curve.G, curve.GFn)
+        self.privkey = 0xcbf4b9f70470856bb4f40f80b87edb90865997ffee6df315ab166d713af433a5
+        self.pubkey = self.ecdsa.calcpub(self.privkey)
+        self.signature = self.ecdsa.sign(12345, self.privkey, 987654321)
+
+    def test_explicit_table(self):
+        table = self.ecdsa.add_key_table(self.pubkey)
+        self.assertIs(table, self.ecdsa.key_table(self.pubkey))
+        self.assertEqual(self.pubkey * 0xabcdef, table.mul(0xabcdef))
+
+        self.assertTrue(self.ecdsa.verify(12345, self.pubkey, *self.signature))
+        self.assertFalse(self.ecdsa.verify(12346, self.pubkey, *self.signature))
+
+        stats = self.ecdsa.key_table_stats()
+        self.assertEqual(1, stats['pinned'])
+        self.assertEqual(table.size(), stats['points'])
+        self.assertGreater(stats['memory'], 0)
+
+        self.assertTrue(self.ecdsa.remove_key_table(self.pubkey))
+        self.assertFalse(self.ecdsa.remove_key_table(self.pubkey))
+
+    def test_automatic_table(self):
+        self.ecdsa.KEY_TABLE_THRESHOLD = 3
+        for i in range(2):
+            self.assertIsNone(self.ecdsa.key_table(self.pubkey))
+        self.assertTrue(self.ecdsa.verify(12345, self.pubkey, *self.signature))
+        self.assertIsNotNone(self.ecdsa.key_table(self.pubkey))
+        self.assertTrue(self.ecdsa.verify(12345, self.pubkey, *self.signature))
+        self.assertEqual([True, False], self.ecdsa.verify_batch([
+            (12345, self.pubkey) + self.signature, (12346, self.pubkey) + self.signature]))
+        self.assertEqual(1, self.ecdsa.key_table_stats()['automatic'])
+
+        self.ecdsa.clear_key_tables()
+        self.assertEqual({'pinned': 0, 'automatic': 0, 'points': 0, 'memory': 0}, self.ecdsa.key_table_stats())
+
+    def test_caches_are_created_lazily(self):
+        decoded = ECDSA.decode_secp256r1(b'026241e7e26b38bb7154b8ad49458b97fb1c4797443dc921c5ca5774f511a2bbfc')
+        self.assertIsNone(decoded._key_table_caches)
+        self.assertFalse(decoded.remove_key_table(self.pubkey))
+        decoded.clear_key_tables()
+        self.assertEqual({'pinned': 0, 'automatic': 0, 'points': 0, 'memory': 0}, decoded.key_table_stats())
+        self.assertIsNone(decoded._key_table_caches)
+
+        self.assertIsNone(self.ecdsa.key_table(self.pubkey))
+        self.assertIsNotNone(self.ecdsa._key_table_caches)
+
+    def test_automatic_tables_disabled(self):
+        self.ecdsa.KEY_TABLE_THRESHOLD = 0
+        for i in range(3):
+            self.assertTrue(self.ecdsa.verify(12345, self.pubkey, *self.signature))
+        self.assertIsNone(self.ecdsa.key_table(self.pubkey))
+
+
+class CurveRegistryTestCase(TestCase):
+    def test_named_curves_are_shared(self):
+        self.assertIs(ECDSA.secp256r1(), ECDSA.secp256r1())
+        self.assertIs(ECDSA.secp256k1(), ECDSA.secp256k1())
+        self.assertIs(ECDSA.secp256r1(), ECCurve.named_curve('secp256r1'))
+        self.assertIsNot(ECDSA.secp256r1(), ECDSA.secp256k1())
+
+        with self.assertRaises(ValueError):
+            ECCurve.named_curve('unknown')
+
+    def test_decoded_keys_share_the_curve(self):
+        curve = ECDSA.secp256r1()
+        decoded = ECDSA.decode_secp256r1(b'026241e7e26b38bb7154b8ad49458b97fb1c4797443dc921c5ca5774f511a2bbfc')
+
+        self.assertIs(curve.ec, decoded.Curve)
+        self.assertIs(curve.GFn, decoded.GFn)
+        self.assertEqual(curve.calcpub(0xcbf4b9f70470856bb4f40f80b87edb90865997ffee6df315ab166d713af433a5), decoded.G)
+
+    def test_secp256k1_glv(self):
+        curve = ECDSA.secp256k1()
+        glv = curve.Curve._glv
+        self.assertIsNotNone(glv)
+        self.assertIsNone(ECDSA.secp256r1().Curve._glv)
+
+        # lambda * G = (beta * Gx, Gy)
+        self.assertEqual(curve.G * glv.lam, curve.Curve.point(glv.beta * curve.G.x.value % curve.Curve.field.p, curve.G.y.value))
+
+        for k in [1, 12345, 0xcbf4b9f70470856bb4f40f80b87edb90865997ffee6df315ab166d713af433a5, curve.GFn.p - 1]:
+            k1, k2 = glv.split(k)
+            self.assertEqual(k % glv.n, (k1 + k2 * glv.lam) % glv.n)
+            self.assertLessEqual(max(abs(k1), abs(k2)).bit_length(), 129)
+
+            self.assertEqual(curve.mul_generator(k), curve.G * k)
+            self.assertEqual(curve.mul_generator(k * 7), (curve.G * 7) * k)
+
+        privkey = 0xcbf4b9f70470856bb4f40f80b87edb90865997ffee6df315ab166d713af433a5
+        r, s = curve.sign(12345, privkey, 987654321)
+        self.assertTrue(curve.verify(12345, curve.calcpub(privkey), r, s))
+        self.assertFalse(curve.verify(12346, curve.calcpub(privkey), r, s))
+
+    def test_secp256k1(self):
+        curve = ECDSA.secp256k1()
+        # public key of private key 1 is the generator, 2 is a known testvector
+        self.assertEqual(curve.G, curve.calcpub(1))
+        self.assertEqual(0xC6047F9441ED7D6D3045406E95C07CD85C778E4B8CEF3CA7ABAC09B95C709EE5, curve.calcpub(2).x.value)
+
+    def test_decoded_points_are_cached(self):
+        curve = ECDSA.secp256r1().Curve
+        encoded = b'026241e7e26b38bb7154b8ad49458b97fb1c4797443dc921c5ca5774f511a2bbfc'
+        curve.point_cache.clear()
+
+        first = ECDSA.decode_secp256r1(encoded).G
+        second = ECDSA.decode_secp256r1(binascii.unhexlify(encoded), unhex=False).G
+        third = ECDSA.Deserialize_Secp256r1(BinaryReader(io.BytesIO(binascii.unhexlify(encoded))))
+
+        self.assertEqual(first, second)
+        self.assertEqual(first, third)
+        stats = curve.point_cache.stats()
+        self.assertEqual(1, stats['misses'])
+        self.assertEqual(2, stats['hits'])
+
+    def test_cached_points_are_not_shared(self):
+        curve = ECDSA.secp256r1().Curve
+        encoded = b'026241e7e26b38bb7154b8ad49458b97fb1c4797443dc921c5ca5774f511a2bbfc'
+        curve.point_cache.clear()
+
+        expected = ECDSA.decode_secp256r1(encoded).G
+        ECDSA.decode_secp256r1(encoded).G.x = curve.field.value(5)
+        curve.decompress_many([binascii.unhexlify(encoded)])[0].y = curve.field.value(5)
+
+        decoded = ECDSA.decode_secp256r1(encoded).G
+        self.assertEqual(expected, decoded)
+        self.assertTrue(decoded.isoncurve())
+        self.assertEqual(encoded, decoded.encode_point(True))
+
+    def test_decompress_many(self):
+        ecdsa = ECDSA.secp256r1()
+        points = [ecdsa.calcpub(k) for k in (1, 2, 3)]
+        encodings = [binascii.unhexlify(points[0].encode_point(True)),
+                     bytearray(binascii.unhexlify(points[1].encode_point(True))),
+                     memoryview(binascii.unhexlify(points[2].encode_point(False)))]
+
+        self.assertEqual(points, ecdsa.Curve.decompress_many(encodings))
+        self.assertEqual([], ecdsa.Curve.decompress_many([]))
+
+    def test_decompress_many_invalid_encoding(self):
+        curve = ECDSA.secp256r1().Curve
+        valid = binascii.unhexlify(b'026241e7e26b38bb7154b8ad49458b97fb1c4797443dc921c5ca5774f511a2bbfc')
+
+        with self.assertRaises(ValueError) as context:
+            curve.decompress_many([valid, b'\x02' + b'\x00' * 31 + b'\x01'])
+        self.assertIn('index 1', str(context.exception))
+
+        with self.assertRaises(ValueError):
+            curve.decompress_many([valid[:20]])
+
+    def test_invalid_points_are_not_cached(self):
+        curve = ECDSA.secp256r1().Curve
+        encoded = b'04' + b'00' * 31 + b'01' + b'00' * 31 + b'02'
+
+        with self.assertRaises(Exception):
+            ECDSA.decode_secp256r1(encoded)
+        self.assertNotIn(binascii.unhexlify(encoded), curve.point_cache)